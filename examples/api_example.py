@@ -10,11 +10,19 @@ Requirements:
 - V4C package installed
 - .mcool files with Hi-C data
 - Python 3.7+
+- PyTables (for the .h5 output used below)
 """
 
 import os
 import sys
-import pandas as pd
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import matplotlib
+
+# The examples only write image files, so select the non-interactive Agg
+# backend before v4c pulls in pyplot and skip GUI backend discovery
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 
 # Add the parent directory to the path to import v4c
@@ -23,6 +31,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from v4c.extract import extract_v4c
 from v4c.plot import plot_v4c
 from v4c.compare import compare_v4c
+from v4c.utils import read_v4c_table
 
 
 def example_basic_extraction():
@@ -38,7 +47,7 @@ def example_basic_extraction():
     genome = "hg38"
     flank = 500000
     normalization_method = "minmax"
-    output_file = "api_extracted_data.tsv"
+    output_file = "api_extracted_data.h5"
     
     try:
         # Extract Virtual 4C data
@@ -55,7 +64,7 @@ def example_basic_extraction():
         print(f"✓ Data extracted successfully to {output_file}")
         
         # Read and display the results
-        df = pd.read_csv(output_file, sep='\t')
+        df = read_v4c_table(output_file)
         print(f"✓ Extracted data shape: {df.shape}")
         print(f"✓ Columns: {list(df.columns[:10])}...")  # Show first 10 columns
         
@@ -107,9 +116,11 @@ def example_bed_file_extraction():
 chr18	22166892	22171892	GATA6
 chr13	73052476	73057476	KLF5"""
     
-    bed_file = "sample_regions.bed"
-    with open(bed_file, 'w') as f:
-        f.write(bed_content)
+    # Written once to the temp directory and reused by later runs
+    bed_file = os.path.join(tempfile.gettempdir(), "v4c_sample_regions.bed")
+    if not os.path.exists(bed_file):
+        with open(bed_file, 'w') as f:
+            f.write(bed_content)
     
     # Define input parameters
     mcool_files = ["/path/to/your/sample.mcool"]  # Replace with actual file path
@@ -132,13 +143,8 @@ chr13	73052476	73057476	KLF5"""
         
         print(f"✓ BED file data extracted successfully to {output_file}")
         
-        # Clean up
-        os.remove(bed_file)
-        
     except Exception as e:
         print(f"✗ Error in BED file extraction: {e}")
-        if os.path.exists(bed_file):
-            os.remove(bed_file)
 
 
 def example_plotting():
@@ -148,7 +154,7 @@ def example_plotting():
     print("\n=== Example 4: Plotting ===")
     
     # Assume we have extracted data
-    input_file = "api_extracted_data.tsv"
+    input_file = "api_extracted_data.h5"
     
     if not os.path.exists(input_file):
         print(f"✗ Input file {input_file} not found. Run extraction examples first.")
@@ -254,15 +260,18 @@ def example_workflow():
     ]
     
     # Step 1: Extract data for both samples
-    for i, mcool_file in enumerate(mcool_files):
-        if not os.path.exists(mcool_file):
-            print(f"✗ File not found: {mcool_file}")
-            continue
+    # Each .mcool file is read independently, so the extractions run in
+    # separate processes (cooler/HDF5 reads do not scale across threads)
+    futures = {}
+    with ProcessPoolExecutor(max_workers=min(len(mcool_files), os.cpu_count() or 1)) as executor:
+        for i, mcool_file in enumerate(mcool_files):
+            if not os.path.exists(mcool_file):
+                print(f"✗ File not found: {mcool_file}")
+                continue
             
-        output_file = f"sample_{i+1}_data.tsv"
-        
-        try:
-            extract_v4c(
+            output_file = f"sample_{i+1}_data.tsv"
+            future = executor.submit(
+                extract_v4c,
                 mcool_files=[mcool_file],
                 resolution=10000,
                 genes="MYC,GATA6",
@@ -271,24 +280,33 @@ def example_workflow():
                 normalization_method="minmax",
                 output=output_file
             )
-            print(f"✓ Extracted data for sample {i+1}")
-            
-        except Exception as e:
-            print(f"✗ Error extracting sample {i+1}: {e}")
-    
-    # Step 2: Generate individual plots
-    for i in range(len(mcool_files)):
-        input_file = f"sample_{i+1}_data.tsv"
-        if os.path.exists(input_file):
+            futures[future] = i
+        
+        for future in as_completed(futures):
+            i = futures[future]
             try:
-                plot_v4c(
-                    input_file=input_file,
-                    ylim=0.4,
-                    output_file=f"sample_{i+1}_plots.png"
-                )
-                print(f"✓ Generated plots for sample {i+1}")
+                future.result()
+                print(f"✓ Extracted data for sample {i+1}")
             except Exception as e:
-                print(f"✗ Error plotting sample {i+1}: {e}")
+                print(f"✗ Error extracting sample {i+1}: {e}")
+    
+    # Step 2: Plot all samples into one shared figure (one row per sample,
+    # one column per region) so the figure is set up and written only once
+    sample_files = [f"sample_{i+1}_data.tsv" for i in range(len(mcool_files))]
+    sample_files = [f for f in sample_files if os.path.exists(f)]
+    if sample_files:
+        n_regions = max(len(read_v4c_table(f)[['chrom', 'start', 'end']].drop_duplicates()) for f in sample_files)
+        fig, axes = plt.subplots(nrows=len(sample_files), ncols=n_regions,
+                                 figsize=(10 * n_regions, 6 * len(sample_files)), squeeze=False)
+        try:
+            for i, input_file in enumerate(sample_files):
+                plot_v4c(input_file=input_file, ylim=0.4, ax=axes[i])
+            fig.savefig("workflow_plots.png", dpi=300, bbox_inches='tight')
+            print(f"✓ Generated plots for {len(sample_files)} samples")
+        except Exception as e:
+            print(f"✗ Error plotting samples: {e}")
+        finally:
+            plt.close(fig)
     
     # Step 3: Compare samples
     input_files = [f"sample_{i+1}_data.tsv" for i in range(len(mcool_files))]
@@ -312,6 +330,18 @@ def example_workflow():
             print(f"✗ Error in comparison: {e}")
 
 
+def row_stats(freqs):
+    """
+    Computes per-row mean, max, min and argmax of a 2D contact block.
+
+    The max is read back through the argmax indices rather than scanning
+    the block a second time.
+    """
+    peak_idx = freqs.argmax(axis=1)
+    max_ = np.take_along_axis(freqs, peak_idx[:, None], axis=1).ravel()
+    return freqs.mean(axis=1), max_, freqs.min(axis=1), peak_idx
+
+
 def example_data_analysis():
     """
     Example 7: Data analysis and manipulation
@@ -319,7 +349,7 @@ def example_data_analysis():
     print("\n=== Example 7: Data Analysis ===")
     
     # Load extracted data
-    input_file = "api_extracted_data.tsv"
+    input_file = "api_extracted_data.h5"
     
     if not os.path.exists(input_file):
         print(f"✗ Input file {input_file} not found.")
@@ -327,7 +357,7 @@ def example_data_analysis():
     
     try:
         # Read the data
-        df = pd.read_csv(input_file, sep='\t')
+        df = read_v4c_table(input_file)
         print(f"✓ Loaded data: {df.shape}")
         
         # Basic statistics
@@ -340,33 +370,27 @@ def example_data_analysis():
         
         print(f"✓ Number of contact bins: {len(contact_cols)}")
         
-        # Calculate statistics for each gene
-        for gene in df['gene_name'].unique():
-            if pd.isna(gene) or gene == '':
-                continue
-                
-            gene_data = df[df['gene_name'] == gene]
+        # Keep only rows with a gene name
+        df = df.dropna(subset=['gene_name'])
+        df = df[df['gene_name'] != '']
+
+        # Convert the contact block once; groups index into it by row position
+        mat = df[contact_cols].to_numpy(dtype=np.float32)
+        names = np.asarray(contact_cols)
+        res_all = df['res'].to_numpy()
+
+        # One pass over the genes: statistics and peak contact frequencies
+        for gene, rows in df.groupby('gene_name', sort=False).indices.items():
+            mean, max_, min_, peak_idx = row_stats(mat[rows])
+            res_values = res_all[rows]
+
             print(f"\n--- {gene} ---")
-            
-            for _, row in gene_data.iterrows():
-                contact_values = row[contact_cols].values
-                print(f"  Resolution {row['res']}: mean={contact_values.mean():.4f}, "
-                      f"max={contact_values.max():.4f}, min={contact_values.min():.4f}")
-        
-        # Find peak contact frequencies
-        for gene in df['gene_name'].unique():
-            if pd.isna(gene) or gene == '':
-                continue
-                
-            gene_data = df[df['gene_name'] == gene]
-            for _, row in gene_data.iterrows():
-                contact_values = row[contact_cols].values
-                peak_idx = contact_values.argmax()
-                peak_value = contact_values.max()
-                peak_position = contact_cols[peak_idx]
-                
-                print(f"  {gene} (res {row['res']}): Peak at position {peak_position} "
-                      f"with value {peak_value:.4f}")
+            for i, res in enumerate(res_values):
+                print(f"  Resolution {res}: mean={mean[i]:.4f}, "
+                      f"max={max_[i]:.4f}, min={min_[i]:.4f}")
+            for i, res in enumerate(res_values):
+                print(f"  {gene} (res {res}): Peak at position {names[peak_idx[i]]} "
+                      f"with value {max_[i]:.4f}")
         
     except Exception as e:
         print(f"✗ Error in data analysis: {e}")
@@ -394,13 +418,14 @@ def main():
     print("\n=== Summary ===")
     print("✓ All examples completed!")
     print("✓ Check the generated files:")
-    print("  - api_extracted_data.tsv")
+    print("  - api_extracted_data.h5")
     print("  - api_coordinate_data.tsv")
     print("  - api_bed_data.tsv")
     print("  - api_plots.png")
     print("  - api_custom_plots.png")
     print("  - api_comparison.png")
     print("  - api_custom_comparison.png")
+    print("  - workflow_plots.png")
     print("  - workflow_comparison.png")
     
     print("\nFor more information, see the V4C documentation.")
@@ -34,21 +34,35 @@ def sample_output_file(tmp_path):
     """Return a temporary output file path."""
     return str(tmp_path / "test_output.tsv")
 
-@pytest.fixture
-def sample_dataframe():
-    """Return a sample DataFrame for testing."""
-    data = {
+@pytest.fixture(scope="session")
+def sample_contact_freqs():
+    """Return sample contact frequencies as a 2D float32 block (one row per sample)."""
+    return np.asarray([
+        [0.1, 0.2, 0.3, 0.2, 0.1],
+        [0.15, 0.25, 0.35, 0.25, 0.15]
+    ], dtype=np.float32)
+
+@pytest.fixture(scope="session")
+def sample_dataframe(sample_contact_freqs):
+    """Return a sample DataFrame in the layout written by extract_v4c."""
+    meta = pd.DataFrame({
         "mcool": ["sample1.mcool", "sample2.mcool"],
         "res": [5000, 10000],
         "chrom": ["chr17", "chr17"],
         "start": [45878152, 45878152],
         "end": [46000000, 46000000],
-        "contact_freqs": [
-            [0.1, 0.2, 0.3, 0.2, 0.1],
-            [0.15, 0.25, 0.35, 0.25, 0.15]
-        ]
-    }
-    return pd.DataFrame(data)
+        "gene_name": ["MAPT", "MAPT"]
+    })
+    bin_cols = [str(45878152 + i * 5000) for i in range(sample_contact_freqs.shape[1])]
+    freqs = pd.DataFrame(sample_contact_freqs, columns=bin_cols)
+    return pd.concat([meta, freqs], axis=1)
+
+@pytest.fixture(scope="session")
+def sample_dataframe_file(sample_dataframe, tmp_path_factory):
+    """Return the path to sample_dataframe written once as TSV for the session."""
+    path = str(tmp_path_factory.mktemp("v4c") / "sample_dataframe.tsv")
+    sample_dataframe.to_csv(path, sep="\t", index=False)
+    return path
 
 @pytest.fixture
 def mock_cooler_matrix():
@@ -59,4 +73,62 @@ def mock_cooler_matrix():
         [0.3, 0.4, 1.0, 0.4, 0.3],
         [0.2, 0.3, 0.4, 1.0, 0.5],
         [0.1, 0.2, 0.3, 0.5, 1.0]
-    ]) 
\ No newline at end of file
+    ])
+
+
+@pytest.fixture
+def promoter_genome(tmp_path, monkeypatch):
+    """Return the name of a small promoter annotation under genome/ in a temporary working directory."""
+    genome_dir = tmp_path / "genome"
+    genome_dir.mkdir()
+    (genome_dir / "test_promoters.bed").write_text(
+        "chr17\t45894000\t45896000\tMAPT\n"
+        "chr2\t1000\t3000\tGENE_B\n"
+        "chr17\t43800000\t43802000\tCRHR1\n"
+        "chr17\t45000000\t45002000\tGENE_A\n"
+    )
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("v4c.utils.PROMOTER_CACHE_DIR", str(tmp_path / "cache"))
+    return "test"
+
+@pytest.fixture
+def serial_and_parallel(tmp_path):
+    """Return a helper that runs a job with n_jobs=1 and n_jobs=2 and asserts both write the same files."""
+    def run(job):
+        outputs = {}
+        for n_jobs in (1, 2):
+            out_dir = tmp_path / f"jobs{n_jobs}"
+            out_dir.mkdir()
+            job(n_jobs, out_dir)
+            outputs[n_jobs] = {path.name: path.read_bytes() for path in out_dir.iterdir()}
+        assert outputs[1] == outputs[2]
+        return outputs[1]
+    return run
+
+@pytest.fixture(scope="session")
+def synthetic_mcool(tmp_path_factory):
+    """Return the path to a small .mcool with dense contacts on chr17 at 10 kb and 50 kb."""
+    import cooler
+
+    path = str(tmp_path_factory.mktemp("mcool") / "synthetic.mcool")
+    chromsizes = pd.Series({"chr17": 2_000_000})
+    rng = np.random.default_rng(0)
+    for resolution in (10000, 50000):
+        bins = cooler.binnify(chromsizes, resolution)
+        bin1, bin2 = np.triu_indices(len(bins))
+        pixels = pd.DataFrame({"bin1_id": bin1, "bin2_id": bin2,
+                               "count": rng.integers(1, 100, size=len(bin1))})
+        cooler.create_cooler(f"{path}::resolutions/{resolution}", bins, pixels,
+                             mode="a" if resolution != 10000 else "w")
+    return path
+
+@pytest.fixture
+def synthetic_bed(tmp_path):
+    """Return the path to a BED file of overlapping promoters on the synthetic chr17."""
+    path = tmp_path / "promoters.bed"
+    path.write_text(
+        "chr17\t400000\t402000\tGENE_A\n"
+        "chr17\t430000\t431000\tGENE_B\n"
+        "chr17\t1500000\t1502000\tGENE_C\n"
+    )
+    return str(path)
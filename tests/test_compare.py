@@ -2,13 +2,14 @@ import pytest
 import pandas as pd
 import numpy as np
 import os
+import shutil
 from v4c import compare_v4c
 from v4c.extract import V4CError, InputValidationError, FileProcessingError
 
-def test_compare_v4c_basic(sample_dataframe, sample_output_file, tmp_path):
+def test_compare_v4c_basic(sample_dataframe_file, sample_output_file, tmp_path):
     """Test basic functionality of compare_v4c."""
     # Save sample data
-    sample_dataframe.to_csv(sample_output_file, sep="\t", index=False)
+    shutil.copyfile(sample_dataframe_file, sample_output_file)
     
     # Test comparison
     output_plot = str(tmp_path / "test_compare.png")
@@ -27,7 +28,7 @@ def test_compare_v4c_multiple_files(sample_dataframe, sample_output_file, tmp_pa
     # Create two different datasets
     df1 = sample_dataframe.copy()
     df2 = sample_dataframe.copy()
-    df2["contact_freqs"] = df2["contact_freqs"].apply(lambda x: [v * 1.5 for v in x])
+    df2.iloc[:, 6:] = df2.iloc[:, 6:] * 1.5
     
     # Save datasets
     file1 = str(tmp_path / "data1.tsv")
@@ -71,10 +72,10 @@ def test_compare_v4c_invalid_data(sample_output_file):
     with pytest.raises(InputValidationError):
         compare_v4c([sample_output_file], ylim=0.4)
 
-def test_compare_v4c_custom_parameters(sample_dataframe, sample_output_file, tmp_path):
+def test_compare_v4c_custom_parameters(sample_dataframe_file, sample_output_file, tmp_path):
     """Test compare_v4c with custom parameters."""
     # Save sample data
-    sample_dataframe.to_csv(sample_output_file, sep="\t", index=False)
+    shutil.copyfile(sample_dataframe_file, sample_output_file)
     
     # Test with custom parameters
     output_plot = str(tmp_path / "test_compare.png")
@@ -90,10 +91,10 @@ def test_compare_v4c_custom_parameters(sample_dataframe, sample_output_file, tmp
     
     assert os.path.exists(output_plot)
 
-def test_compare_v4c_scaling(sample_dataframe, sample_output_file, tmp_path):
+def test_compare_v4c_scaling(sample_dataframe_file, sample_output_file, tmp_path):
     """Test compare_v4c with and without scaling."""
     # Save sample data
-    sample_dataframe.to_csv(sample_output_file, sep="\t", index=False)
+    shutil.copyfile(sample_dataframe_file, sample_output_file)
     
     # Test with scaling
     output_scaled = str(tmp_path / "test_compare_scaled.png")
@@ -125,9 +126,9 @@ def test_compare_v4c_empty_data(sample_output_file):
     with pytest.raises(FileProcessingError):
         compare_v4c([sample_output_file], ylim=0.4)
 
-def test_compare_v4c_file_permissions(sample_dataframe, sample_output_file, tmp_path):
+def test_compare_v4c_file_permissions(sample_dataframe_file, sample_output_file, tmp_path):
     """Test compare_v4c with file permission issues."""
-    sample_dataframe.to_csv(sample_output_file, sep="\t", index=False)
+    shutil.copyfile(sample_dataframe_file, sample_output_file)
     
     # Try to save to a directory without write permissions
     output_plot = "/root/test_compare.png"  # This should fail on most systems
@@ -137,3 +138,37 @@ def test_compare_v4c_file_permissions(sample_dataframe, sample_output_file, tmp_
             ylim=0.4,
             output_file=output_plot
         )
+
+def test_compare_v4c_numeric_chromosomes(sample_dataframe, tmp_path):
+    """Test compare_v4c finds the rows of numerically named chromosomes."""
+    df = sample_dataframe.copy()
+    df["chrom"] = 17
+    input_file = str(tmp_path / "numeric_chrom.tsv")
+    df.to_csv(input_file, sep="\t", index=False)
+
+    output_plot = str(tmp_path / "test_compare.png")
+    compare_v4c(input_files=[input_file], ylim=0.4, output_file=output_plot)
+
+    # The gene name is only found when the coordinate keys match the table rows
+    assert os.path.exists(str(tmp_path / "test_compare_MAPT.png"))
+
+def test_compare_v4c_parallel_matches_serial(sample_dataframe, tmp_path, serial_and_parallel):
+    """Test compare_v4c with worker processes saves the same plots as a serial run."""
+    df = sample_dataframe.copy()
+    df.loc[1, ["start", "end", "gene_name"]] = [50000000, 50100000, "CRHR1"]
+    input_file = str(tmp_path / "two_coords.tsv")
+    df.to_csv(input_file, sep="\t", index=False)
+
+    saved = serial_and_parallel(lambda n_jobs, out_dir: compare_v4c(
+        [input_file], ylim=0.4, output_file=str(out_dir / "cmp.png"), dpi=50, n_jobs=n_jobs))
+    assert sorted(saved) == ["cmp_CRHR1.png", "cmp_MAPT.png"]
+
+def test_compare_v4c_blank_gene_name(sample_dataframe, tmp_path):
+    """Test coordinates with a blank gene name are named by coordinate, not 'nan'."""
+    df = sample_dataframe.copy()
+    df.loc[1, ["start", "end", "gene_name"]] = [50000000, 50100000, ""]
+    input_file = str(tmp_path / "blank_gene.tsv")
+    df.to_csv(input_file, sep="\t", index=False)
+
+    compare_v4c([input_file], ylim=0.4, output_file=str(tmp_path / "cmp.png"), dpi=50)
+    assert sorted(path.name for path in tmp_path.glob("cmp_*.png")) == ["cmp_MAPT.png", "cmp_chr17_50000000_50100000.png"]
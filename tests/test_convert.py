@@ -0,0 +1,38 @@
+import pytest
+import pandas as pd
+import os
+import shutil
+from v4c.convert import PIXEL_CHUNK_ROWS, convert_hic_to_mcool, rechunk_mcool
+
+def test_rechunk_mcool(synthetic_mcool, tmp_path):
+    """Test rechunk_mcool rewrites pixel chunks in place without changing the contacts."""
+    import cooler
+    import h5py
+
+    mcool = str(tmp_path / "rechunk.mcool")
+    shutil.copyfile(synthetic_mcool, mcool)
+    assert rechunk_mcool(mcool, chunk_rows=1000) == mcool
+    assert not os.path.exists(mcool + ".tmp")
+    with h5py.File(mcool, "r") as f:
+        assert f["resolutions/10000/pixels/count"].chunks == (1000,)
+    for resolution in (10000, 50000):
+        before = cooler.Cooler(f"{synthetic_mcool}::resolutions/{resolution}").pixels()[:]
+        after = cooler.Cooler(f"{mcool}::resolutions/{resolution}").pixels()[:]
+        pd.testing.assert_frame_equal(before, after)
+
+def test_convert_hic_to_mcool_rechunks_up_to_date_output(synthetic_mcool, tmp_path):
+    """Test an up-to-date output is rechunked, not skipped, when rechunk is requested."""
+    import h5py
+
+    hic_file = tmp_path / "synthetic.hic"
+    hic_file.write_text("")
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    mcool = str(output_dir / "synthetic.mcool")
+    shutil.copyfile(synthetic_mcool, mcool)
+    os.utime(hic_file, (0, 0))
+
+    assert convert_hic_to_mcool(str(hic_file), str(output_dir), [10000, 50000], rechunk=True) == mcool
+    with h5py.File(mcool, "r") as f:
+        count = f["resolutions/10000/pixels/count"]
+        assert count.chunks == (min(PIXEL_CHUNK_ROWS, len(count)),)
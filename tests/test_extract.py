@@ -3,7 +3,9 @@ import pandas as pd
 import numpy as np
 from v4c import extract_v4c
 from v4c.extract import V4CError, InputValidationError, FileProcessingError
+from v4c.extract import _cluster_windows, _extract_one, _normalize_rows, _promoter_windows
 import os
+import shutil
 
 def test_extract_v4c_basic(sample_mcool_file, sample_coords, sample_resolutions, sample_output_file):
     """Test basic functionality of extract_v4c."""
@@ -140,3 +142,54 @@ def test_extract_v4c_output_format(sample_mcool_file, sample_coords, sample_reso
     required_columns = ["mcool", "res", "chrom", "start", "end"]
     assert all(col in df.columns for col in required_columns)
     assert len(df.columns) > len(required_columns)  # Should have additional contact frequency columns
+
+def test_cluster_windows():
+    """Test overlapping windows share a slab unless it would exceed max_bins."""
+    windows = [("chr1", 10, 30, 5), ("chr1", 0, 20, 5), ("chr2", 0, 20, 5), ("chr1", 50, 60, 5)]
+    assert list(_cluster_windows(windows)) == [(0, 30, [1, 0]), (50, 60, [3]), (0, 20, [2])]
+    assert list(_cluster_windows(windows, max_bins=25)) == [(0, 20, [1]), (10, 30, [0]), (50, 60, [3]), (0, 20, [2])]
+
+def test_extract_one_slabs_match_per_promoter_fetch(synthetic_mcool):
+    """Test rows cut from shared slabs equal fetching each promoter's window on its own."""
+    import cooler
+
+    promoter_coords = [("chr17", 400000, 402000), ("chr17", 430000, 431000), ("chr17", 1500000, 1502000)]
+    windows = _promoter_windows(promoter_coords, 10000, 100000, False)
+    meta_rows, contacts, lengths = _extract_one(synthetic_mcool, 10000, promoter_coords, {}, windows,
+                                                balance=False, scale=False, normalization_method="minmax")
+
+    c = cooler.Cooler(f"{synthetic_mcool}::resolutions/10000")
+    for i, (chrom, region_start, region_end, row_index) in enumerate(zip(*windows)):
+        window = c.matrix(balance=False).fetch((chrom, region_start, region_end))
+        np.testing.assert_array_equal(contacts[i, :lengths[i]], window[row_index])
+    assert [meta[2:5] for meta in meta_rows] == promoter_coords
+
+def test_extract_v4c_parallel_matches_serial(synthetic_mcool, synthetic_bed, tmp_path, serial_and_parallel):
+    """Test extract_v4c with worker processes writes the same table as a serial run."""
+    mcool_copy = str(tmp_path / "copy.mcool")
+    shutil.copyfile(synthetic_mcool, mcool_copy)
+    saved = serial_and_parallel(lambda n_jobs, out_dir: extract_v4c(
+        [synthetic_mcool, mcool_copy], resolution=10000, bed_file=synthetic_bed, flank=100000,
+        balance=False, output=str(out_dir / "extracted.tsv"), n_jobs=n_jobs))
+    assert saved["extracted.tsv"].count(b"\n") == 7
+
+def test_normalize_rows():
+    """Test batched row normalization matches scaling each row on its own."""
+    rows = [np.array([1.0, 3.0, 5.0]), np.array([2.0, 2.0, 2.0]), np.array([4.0, 0.0, 2.0, 8.0])]
+    minmax = _normalize_rows([row.copy() for row in rows], [1, 1, 2], "minmax")
+    np.testing.assert_allclose(minmax[0], [0.0, 0.5, 1.0])
+    np.testing.assert_array_equal(minmax[1], [0.0, 0.0, 0.0])
+    np.testing.assert_allclose(minmax[2], [0.5, 0.0, 0.25, 1.0])
+    self_norm = _normalize_rows([row.copy() for row in rows], [1, 1, 2], "self")
+    np.testing.assert_allclose(self_norm[0], [1 / 3, 1.0, 5 / 3])
+    np.testing.assert_allclose(self_norm[2], [2.0, 0.0, 1.0, 4.0])
+
+def test_extract_one_float32(synthetic_mcool):
+    """Test _extract_one returns float32 contacts with NaN padding past each row's length."""
+    promoter_coords = [("chr17", 50000, 51000), ("chr17", 1000000, 1001000)]
+    windows = _promoter_windows(promoter_coords, 10000, 100000, False)
+    _, contacts, lengths = _extract_one(synthetic_mcool, 10000, promoter_coords, {}, windows,
+                                        balance=False, scale=True, normalization_method="minmax")
+    assert contacts.dtype == np.float32
+    assert lengths[0] < lengths[1] == contacts.shape[1]
+    assert np.isnan(contacts[0, lengths[0]:]).all()
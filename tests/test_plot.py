@@ -2,13 +2,14 @@ import pytest
 import pandas as pd
 import numpy as np
 import os
+import shutil
 from v4c import plot_v4c
 from v4c.extract import V4CError, InputValidationError, FileProcessingError
 
-def test_plot_v4c_basic(sample_dataframe, sample_output_file, tmp_path):
+def test_plot_v4c_basic(sample_dataframe_file, sample_output_file, tmp_path):
     """Test basic functionality of plot_v4c."""
     # Save sample data
-    sample_dataframe.to_csv(sample_output_file, sep="\t", index=False)
+    shutil.copyfile(sample_dataframe_file, sample_output_file)
     
     # Test plotting
     output_plot = str(tmp_path / "test_plot.png")
@@ -47,10 +48,10 @@ def test_plot_v4c_invalid_data(sample_output_file):
     with pytest.raises(InputValidationError):
         plot_v4c(sample_output_file, ylim=0.4)
 
-def test_plot_v4c_custom_parameters(sample_dataframe, sample_output_file, tmp_path):
+def test_plot_v4c_custom_parameters(sample_dataframe_file, sample_output_file, tmp_path):
     """Test plot_v4c with custom parameters."""
     # Save sample data
-    sample_dataframe.to_csv(sample_output_file, sep="\t", index=False)
+    shutil.copyfile(sample_dataframe_file, sample_output_file)
     
     # Test with custom parameters
     output_plot = str(tmp_path / "test_plot.png")
@@ -101,16 +102,16 @@ def test_plot_v4c_empty_data(sample_output_file):
     with pytest.raises(FileProcessingError):
         plot_v4c(sample_output_file, ylim=0.4)
 
-def test_plot_v4c_invalid_ylim(sample_dataframe, sample_output_file):
+def test_plot_v4c_invalid_ylim(sample_dataframe_file, sample_output_file):
     """Test plot_v4c with invalid ylim."""
-    sample_dataframe.to_csv(sample_output_file, sep="\t", index=False)
+    shutil.copyfile(sample_dataframe_file, sample_output_file)
     
     with pytest.raises(InputValidationError):
         plot_v4c(sample_output_file, ylim=0)  # ylim must be positive
 
-def test_plot_v4c_file_permissions(sample_dataframe, sample_output_file, tmp_path):
+def test_plot_v4c_file_permissions(sample_dataframe_file, sample_output_file, tmp_path):
     """Test plot_v4c with file permission issues."""
-    sample_dataframe.to_csv(sample_output_file, sep="\t", index=False)
+    shutil.copyfile(sample_dataframe_file, sample_output_file)
     
     # Try to save to a directory without write permissions
     output_plot = "/root/test_plot.png"  # This should fail on most systems
@@ -120,3 +121,18 @@ def test_plot_v4c_file_permissions(sample_dataframe, sample_output_file, tmp_pat
             ylim=0.4,
             output_file=output_plot
         )
+
+def test_plot_v4c_into_axes(sample_dataframe_file):
+    """Test plot_v4c draws each group into the given axes."""
+    import matplotlib.pyplot as plt
+
+    fig, axes = plt.subplots(1, 2)
+    plot_v4c(sample_dataframe_file, ylim=0.4, ax=axes)
+    assert all(len(ax.lines) == 1 for ax in axes)
+    assert axes[0].get_ylim() == (0, 0.4)
+    plt.close(fig)
+
+    fig, ax = plt.subplots()
+    with pytest.raises(InputValidationError):
+        plot_v4c(sample_dataframe_file, ylim=0.4, ax=ax)
+    plt.close(fig)
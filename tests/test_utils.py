@@ -0,0 +1,129 @@
+import pytest
+import pandas as pd
+import numpy as np
+import os
+from collections import OrderedDict
+import v4c.utils
+from v4c.utils import (META_COLUMNS, contact_values, find_missing_files, get_promoter_coords,
+                       normalize_data, read_v4c_table, write_v4c_rows, write_v4c_table)
+
+def test_get_promoter_coords_region(promoter_genome):
+    """Test get_promoter_coords region queries return overlaps in file order."""
+    coords = get_promoter_coords(promoter_genome, "chr17", 43000000, 46000000)
+    assert coords == [["chr17", 45894000, 45896000], ["chr17", 43800000, 43802000], ["chr17", 45000000, 45002000]]
+    assert get_promoter_coords(promoter_genome, gene="MAPT") == [["chr17", 45894000, 45896000]]
+
+def test_get_promoter_coords_incomplete_region(promoter_genome):
+    """Test get_promoter_coords without start or end matches nothing."""
+    assert get_promoter_coords(promoter_genome, chrom="chr17") == []
+    assert get_promoter_coords(promoter_genome, chrom="chr17", start=45000000) == []
+    chroms, starts, ends = get_promoter_coords(promoter_genome, chrom="chr17", as_list=False)
+    assert len(chroms) == len(starts) == len(ends) == 0
+
+def test_contact_values_without_gene_name(sample_dataframe, sample_contact_freqs):
+    """Test the contact block skips only the metadata columns present."""
+    np.testing.assert_array_equal(contact_values(sample_dataframe), sample_contact_freqs)
+    np.testing.assert_array_equal(contact_values(sample_dataframe.drop(columns="gene_name")), sample_contact_freqs)
+
+@pytest.mark.parametrize("extension", [".h5", ".parquet", ".pq", ".feather", ".tsv"])
+def test_v4c_table_round_trip(sample_dataframe, tmp_path, extension):
+    """Test write_v4c_table and read_v4c_table round-trip every table format."""
+    path = str(tmp_path / f"table{extension}")
+    write_v4c_table(sample_dataframe, path)
+    df = read_v4c_table(path)
+    assert list(df.columns) == list(sample_dataframe.columns)
+    assert df["mcool"].tolist() == sample_dataframe["mcool"].tolist()
+    assert df["start"].tolist() == sample_dataframe["start"].tolist()
+    np.testing.assert_array_equal(contact_values(df), contact_values(sample_dataframe))
+
+def test_find_missing_files(tmp_path):
+    """Test find_missing_files reports only the paths that do not exist."""
+    present = tmp_path / "present.tsv"
+    present.write_text("")
+    paths = [str(present), str(tmp_path / "absent.tsv"), str(tmp_path / "no_dir" / "file.tsv")]
+    assert find_missing_files(paths) == set(paths[1:])
+    assert find_missing_files([]) == set()
+
+def test_find_missing_files_unlistable_directory(tmp_path, monkeypatch):
+    """Test files in a directory that cannot be listed are checked one by one."""
+    present = tmp_path / "present.tsv"
+    present.write_text("")
+    def deny(path):
+        raise PermissionError(f"cannot list {path}")
+    monkeypatch.setattr(os, "scandir", deny)
+    paths = [str(present), str(tmp_path / "absent.tsv")]
+    assert find_missing_files(paths) == {paths[1]}
+
+def test_write_v4c_rows_float_format(tmp_path):
+    """Test write_v4c_rows formats TSV contacts and leaves missing values empty."""
+    path = str(tmp_path / "rows.tsv")
+    contacts = np.array([[0.123456789, np.nan], [1.0, 2.5]], dtype=np.float32)
+    meta_rows = [("a.mcool", 10000, "chr17", 1, 2, "GENE_A"), ("b.mcool", 10000, "chr17", 1, 2, "")]
+    write_v4c_rows(META_COLUMNS + ["0", "10000"], meta_rows, contacts, path, float_format="%.3g")
+    with open(path) as f:
+        lines = f.read().splitlines()
+    assert lines[1].split("\t")[-2:] == ["0.123", ""]
+    assert lines[2].split("\t")[-3:] == ["", "1", "2.5"]
+
+def test_normalize_data_out():
+    """Test normalize_data writes into out, including in place and for constant data."""
+    data = np.array([2.0, 4.0, 6.0], dtype=np.float32)
+    out = np.empty_like(data)
+    assert normalize_data(data, out=out) is out
+    np.testing.assert_allclose(out, [0.0, 0.5, 1.0])
+    normalize_data(data, out=data)
+    np.testing.assert_allclose(data, [0.0, 0.5, 1.0])
+    assert data.dtype == np.float32
+    constant = np.full(3, 5.0)
+    assert normalize_data(constant, out=constant) is constant
+    np.testing.assert_array_equal(constant, [0.0, 0.0, 0.0])
+
+def test_get_promoter_coords_arrays(promoter_genome):
+    """Test get_promoter_coords as_list=False returns the same coordinates as arrays."""
+    coords = get_promoter_coords(promoter_genome, "chr17", 43000000, 46000000)
+    chroms, starts, ends = get_promoter_coords(promoter_genome, "chr17", 43000000, 46000000, as_list=False)
+    assert isinstance(starts, np.ndarray)
+    assert [list(coord) for coord in zip(chroms.tolist(), starts.tolist(), ends.tolist())] == coords
+
+@pytest.mark.parametrize("use_pyarrow", [True, False])
+def test_read_v4c_table_blank_text(sample_dataframe, tmp_path, monkeypatch, use_pyarrow):
+    """Test blank text fields read as missing with and without pyarrow."""
+    if not use_pyarrow:
+        monkeypatch.setattr("v4c.utils.pa_csv", None)
+    df = sample_dataframe.copy()
+    df.loc[1, "gene_name"] = ""
+    path = str(tmp_path / "blank.tsv")
+    df.to_csv(path, sep="\t", index=False)
+    gene_names = read_v4c_table(path)["gene_name"]
+    assert gene_names[0] == "MAPT"
+    assert pd.isna(gene_names[1])
+
+@pytest.mark.parametrize("extra_column", ["before", "after"])
+def test_read_v4c_table_extra_text_column(sample_dataframe, tmp_path, extra_column):
+    """Test TSV tables with an extra text column read like pandas reads them."""
+    df = sample_dataframe.copy()
+    df.insert(5 if extra_column == "before" else 6, "mcool_file", ["a.mcool", "b.mcool"])
+    path = str(tmp_path / "extra.tsv")
+    df.to_csv(path, sep="\t", index=False)
+    read = read_v4c_table(path)
+    assert read["mcool_file"].tolist() == ["a.mcool", "b.mcool"]
+    assert read["start"].tolist() == df["start"].tolist()
+
+def test_read_v4c_table_cache_size(sample_dataframe, tmp_path, monkeypatch):
+    """Test parsed TSV tables stay cached only within TSV_CACHE_BYTES."""
+    pytest.importorskip("pyarrow")
+    monkeypatch.setattr("v4c.utils._tsv_cache", OrderedDict())
+    paths = []
+    for i in range(3):
+        paths.append(str(tmp_path / f"table{i}.tsv"))
+        sample_dataframe.to_csv(paths[-1], sep="\t", index=False)
+    read_v4c_table(paths[0])
+    table_bytes = v4c.utils._tsv_cache[paths[0]][2].nbytes
+    monkeypatch.setattr("v4c.utils.TSV_CACHE_BYTES", 2 * table_bytes)
+    for path in paths[1:]:
+        read_v4c_table(path)
+    assert list(v4c.utils._tsv_cache) == paths[1:]
+
+    monkeypatch.setattr("v4c.utils.TSV_CACHE_BYTES", table_bytes - 1)
+    read_v4c_table(paths[0])
+    assert paths[0] not in v4c.utils._tsv_cache
@@ -1,9 +1,16 @@
 import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
 import pandas as pd
 import numpy as np
-import os
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Optional, Union
 from .extract import V4CError, InputValidationError, FileProcessingError
+from .utils import META_COLUMNS, TABLE_EXTENSIONS, contact_values, find_missing_files, read_v4c_table, sample_label
+
+__all__ = ["compare_v4c", "validate_compare_inputs"]
 
 def validate_compare_inputs(input_files: List[str], ylim: float, scale: bool) -> None:
     """
@@ -20,15 +27,168 @@ def validate_compare_inputs(input_files: List[str], ylim: float, scale: bool) ->
     if not input_files:
         raise InputValidationError("No input files provided")
     
+    missing_files = find_missing_files(input_files)
     for file in input_files:
-        if not os.path.exists(file):
+        if file in missing_files:
             raise InputValidationError(f"Input file not found: {file}")
-        if not file.endswith('.tsv'):
-            raise InputValidationError(f"Input file must be a TSV file: {file}")
+        if not file.endswith(TABLE_EXTENSIONS):
+            raise InputValidationError(f"Input file must be a TSV, HDF5, Parquet or Feather file: {file}")
     
     if ylim <= 0:
         raise InputValidationError(f"ylim must be positive: {ylim}")
 
+# Row positions used when a coordinate is missing from a table
+_NO_ROWS = np.empty(0, dtype=np.intp)
+
+def _draw_coord(ax,
+                coord: tuple,
+                metas: List[dict],
+                blocks: List[np.ndarray],
+                coord_indices: List[dict],
+                all_mcool_files: List[str],
+                colors: List,
+                sample_names: Optional[dict],
+                gene_names: dict,
+                ylim: float) -> Optional[str]:
+    """
+    Draws the comparison plot of one coordinate into ax.
+
+    Returns:
+        The gene name found in the data for this coordinate, or None
+    """
+    chrom, start, end = coord
+
+    # Collect every dataset's line for this coordinate and draw them as one collection
+    segments, segment_colors, legend_handles = [], [], []
+    # x positions shared by all rows with the same flank and length
+    x_cache = {}
+    for meta, block, indices in zip(metas, blocks, coord_indices):
+        # Rows for this coordinate
+        coord_rows = indices.get(coord, _NO_ROWS)
+
+        for row_index in coord_rows:
+            coords = block[row_index]
+            mcool = meta['mcool'][row_index]
+            # Create genomic coordinates for x-axis
+            num_contacts = len(coords)
+            row_flank = meta['flank'][row_index]
+            # Ensure genomic_coords has the same length as coords
+            x_key = (row_flank, num_contacts)
+            genomic_coords = x_cache.get(x_key)
+            if genomic_coords is None:
+                genomic_coords = x_cache[x_key] = np.linspace(start - row_flank, end + row_flank, num_contacts)
+
+            # Get color index for this mcool file
+            color_index = all_mcool_files.index(mcool)
+            color = colors[color_index % len(colors)]
+
+            label = sample_label(mcool, sample_names)
+
+            segments.append(np.column_stack([genomic_coords, coords]))
+            segment_colors.append(color)
+            legend_handles.append(Line2D([], [], label=label, color=color, alpha=0.7, linewidth=2))
+
+    if segments:
+        # Cap and join styles match the Line2D defaults plt.plot used to draw with
+        lines = LineCollection(segments, colors=segment_colors, alpha=0.7, linewidths=2,
+                               capstyle='projecting', joinstyle='round')
+        ax.add_collection(lines)
+        ax.autoscale_view()
+
+    # Customize plot
+    ax.set_xlabel("Genomic Position (bp)", fontsize=12)
+    ax.set_ylabel("Hi-C Contact Frequency", fontsize=12)
+
+    # Format x-axis with scientific notation for large numbers
+    ax.ticklabel_format(style='scientific', axis='x', scilimits=(0,0))
+
+    # Add coordinate range annotation
+    # Calculate flank from the data (assuming it's the same for all samples)
+    if len(metas) > 0:
+        sample_meta = metas[0]
+        coord_rows = coord_indices[0].get(coord, _NO_ROWS)
+        if len(coord_rows) > 0:
+            # Assuming resolution is consistent, estimate flank
+            estimated_flank = sample_meta['flank'][coord_rows[0]]
+            coord_range = f"{chrom}:{start-estimated_flank:,}-{end+estimated_flank:,}"
+        else:
+            coord_range = f"{chrom}:{start:,}-{end:,}"
+    else:
+        coord_range = f"{chrom}:{start:,}-{end:,}"
+
+    ax.text(0.02, 0.98, f"Region: {coord_range}", 
+            transform=ax.transAxes, 
+            fontsize=10, 
+            verticalalignment='top',
+            bbox=dict(boxstyle='round', facecolor='white', alpha=0.8))
+
+    # Create title with gene name if available, otherwise use coordinate
+    # Priority 1: Use gene_name from data if available
+    gene_name_from_data = gene_names.get(coord)
+
+    if gene_name_from_data:
+        ax.set_title(f"Virtual 4C Comparison - {gene_name_from_data}", fontsize=14)
+    else:
+        coord_label = f"{chrom}:{start}-{end}"
+        ax.set_title(f"Virtual 4C Comparison - {coord_label}", fontsize=14)
+
+    ax.legend(handles=legend_handles)
+    ax.set_ylim(0, ylim)
+
+    return gene_name_from_data
+
+def _coord_output_path(output_file: str, coord: tuple, gene_name: Optional[str]) -> str:
+    """Returns the per-coordinate PNG path derived from output_file."""
+    chrom, start, end = coord
+    # Create unique filename for each coordinate
+    base_name = output_file.replace('.png', '').replace('.pdf', '')
+    
+    # Use gene name in filename if available, otherwise use coordinate
+    if gene_name:
+        coord_suffix = f"_{gene_name}"
+    else:
+        coord_suffix = f"_{chrom}_{start}_{end}"
+    return f"{base_name}{coord_suffix}.png"
+
+def _new_save_figure(figsize: tuple) -> Figure:
+    """
+    Creates the figure compare_v4c draws saved plots into.
+
+    The figure lives on a plain Agg canvas, bypassing pyplot and whichever
+    interactive backend is active, and uses fixed margins instead of
+    bbox_inches='tight', which costs an extra draw pass per figure.
+    """
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    fig.add_subplot()
+    fig.subplots_adjust(left=0.08, right=0.98, top=0.92, bottom=0.1)
+    return fig
+
+def _save_coord(fig: Figure, coord: tuple, draw_kwargs: dict, output_file: str, dpi: int) -> str:
+    """Redraws fig with the plot of one coordinate and saves it as PNG; returns the saved path."""
+    ax = fig.axes[0]
+    ax.clear()
+    gene_name = _draw_coord(ax, coord, **draw_kwargs)
+    unique_output = _coord_output_path(output_file, coord, gene_name)
+    try:
+        fig.savefig(unique_output, dpi=dpi)
+    except Exception as e:
+        raise FileProcessingError(f"Error saving plot to {output_file}: {str(e)}")
+    return unique_output
+
+# Shared compare_v4c arguments of a pool worker, set once by _init_render_worker
+_render_state = {}
+
+def _init_render_worker(state: dict) -> None:
+    """Stores the compare_v4c tables and plot options in a worker process."""
+    _render_state.update(state)
+    _render_state['fig'] = _new_save_figure(state['figsize'])
+
+def _render_coord(coord: tuple) -> str:
+    """Draws and saves the plot of one coordinate in a worker process; returns its path."""
+    state = _render_state
+    return _save_coord(state['fig'], coord, state['draw_kwargs'], state['output_file'], state['dpi'])
+
 def compare_v4c(input_files: List[str], 
                  ylim: float = 1.0, 
                  scale: bool = True,
@@ -36,7 +196,8 @@ def compare_v4c(input_files: List[str],
                  dpi: int = 300,
                  figsize: tuple = (12, 8),
                  colors: Optional[List[str]] = None,
-                 sample_names: Optional[dict] = None) -> None:
+                 sample_names: Optional[dict] = None,
+                 n_jobs: int = 1) -> None:
     """
     Compares Virtual 4C data from multiple .mcool files.
 
@@ -49,6 +210,8 @@ def compare_v4c(input_files: List[str],
         figsize: Figure size (width, height) in inches
         colors: Optional list of colors for different datasets
         sample_names: Optional dict mapping mcool filenames to custom sample names
+        n_jobs: Number of worker processes used to render the per-coordinate
+            plots when output_file is given
 
     Returns:
         None: Displays or saves the comparison plot
@@ -61,6 +224,8 @@ def compare_v4c(input_files: List[str],
     try:
         # Validate inputs
         validate_compare_inputs(input_files, ylim, scale)
+        if n_jobs < 1:
+            raise InputValidationError(f"n_jobs must be at least 1: {n_jobs}")
         
         
         # Read and validate data
@@ -68,7 +233,7 @@ def compare_v4c(input_files: List[str],
         has_gene_name = False
         for file in input_files:
             try:
-                df = pd.read_csv(file, sep="\t")
+                df = read_v4c_table(file)
                 required_columns = ["mcool", "res", "chrom", "start", "end"]
                 if not all(col in df.columns for col in required_columns):
                     raise InputValidationError(f"Input file missing required columns: {required_columns}")
@@ -79,158 +244,94 @@ def compare_v4c(input_files: List[str],
             except Exception as e:
                 raise FileProcessingError(f"Error reading input file {file}: {str(e)}")
 
+        # Contact frequencies of each table as one row-major float32 2D block
+        # (metadata columns skipped), min-max scaled per row in a single vectorized pass.
+        # float32 is as narrow as it goes: matplotlib converts line data to
+        # float64 anyway, so fixed-point storage would only add a cast back.
+        blocks = []
+        for df in dfs:
+            block = contact_values(df)
+            if scale and block.size:
+                # Rows shorter than the widest row are NaN-padded; ignore the padding
+                row_min = np.nanmin(block, axis=1, keepdims=True)
+                row_range = np.nanmax(block, axis=1, keepdims=True) - row_min
+                # Scale in place; the block is a private copy of the table data
+                block -= row_min
+                scalable = row_range > 0
+                np.divide(block, row_range, out=block, where=scalable)
+                block[~scalable[:, 0]] = 0
+            blocks.append(block)
+
+        # Metadata columns of each table as plain arrays, indexed by row position
+        metas = [{col: df[col].to_numpy() for col in META_COLUMNS if col in df.columns} for df in dfs]
+        # Half the span of each row's contact bins, computed for whole tables at once
+        for meta, block in zip(metas, blocks):
+            meta['flank'] = (block.shape[1] * meta['res']) // 2
+
+        # Row positions of each coordinate, one hash lookup per (table, coordinate)
+        coord_indices = [df.groupby(['chrom', 'start', 'end'], sort=False).indices for df in dfs]
+
+        # Gene name of each coordinate: the first non-empty one across tables, in input order
+        gene_names = {}
+        if has_gene_name:
+            for meta, indices in zip(metas, coord_indices):
+                if 'gene_name' not in meta:
+                    continue
+                for coord, coord_rows in indices.items():
+                    gene_name = meta['gene_name'][coord_rows[0]]
+                    if pd.notna(gene_name) and str(gene_name).strip():
+                        gene_names.setdefault(coord, gene_name)
+
         # Create comparison plot for each coordinate
         # Group all data by coordinate first
-        all_coords = set()
+        # Keys keep the tables' own dtypes so they still match coord_indices and
+        # gene_names; the chromosome is only compared as text for ordering
+        all_coords = sorted(set().union(*coord_indices),
+                            key=lambda coord: (str(coord[0]), coord[1], coord[2]))
+        
+        # Get all unique mcool files across all dataframes
+        all_mcool_files = set()
         for df in dfs:
-            for _, row in df.iterrows():
-                all_coords.add((row['chrom'], row['start'], row['end']))
+            all_mcool_files.update(df['mcool'].unique())
+        all_mcool_files = sorted(list(all_mcool_files))
+        
+        # Use default colors if not provided
+        if colors is None:
+            colors = plt.cm.tab10.colors[:len(all_mcool_files)]
+        elif len(colors) == 0:
+            raise InputValidationError("colors must contain at least one color")
+
+        draw_kwargs = dict(metas=metas, blocks=blocks, coord_indices=coord_indices,
+                           all_mcool_files=all_mcool_files, colors=colors, sample_names=sample_names,
+                           gene_names=gene_names, ylim=ylim)
         
         # Create a plot for each coordinate
         print(f"Found {len(all_coords)} coordinates to process: {all_coords}")
+        if output_file and n_jobs > 1 and len(all_coords) > 1:
+            # Figures are independent, so render them in worker processes. The tables
+            # are handed to each worker once, not pickled again for every coordinate.
+            state = dict(draw_kwargs=draw_kwargs, figsize=figsize, output_file=output_file, dpi=dpi)
+            with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_render_worker, initargs=(state,)) as executor:
+                for i, (coord, unique_output) in enumerate(zip(all_coords, executor.map(_render_coord, all_coords))):
+                    chrom, start, end = coord
+                    print(f"Saved coordinate {i+1}/{len(all_coords)}: {chrom}:{start}-{end} to {unique_output}")
+            return
+
+        # One figure is redrawn for every saved coordinate
+        save_fig = _new_save_figure(figsize) if output_file else None
         for i, coord in enumerate(all_coords):
             chrom, start, end = coord
             print(f"Processing coordinate {i+1}/{len(all_coords)}: {chrom}:{start}-{end}")
-            plt.figure(figsize=figsize)
-            
-            # Get all unique mcool files across all dataframes
-            all_mcool_files = set()
-            for df in dfs:
-                all_mcool_files.update(df['mcool'].unique())
-            all_mcool_files = sorted(list(all_mcool_files))
-            
-            # Use default colors if not provided
-            if colors is None:
-                colors = plt.cm.tab10.colors[:len(all_mcool_files)]
-            
-            # Plot each dataset for this coordinate
-            for df in dfs:
-                # Filter data for this coordinate
-                coord_data = df[(df['chrom'] == chrom) & (df['start'] == start) & (df['end'] == end)]
-                
-                for _, row in coord_data.iterrows():
-                    try:
-                        # Skip metadata columns (mcool, res, chrom, start, end, gene_name)
-                        coords = list(map(float, row[6:].values))
-                        if scale:
-                            min_val, max_val = min(coords), max(coords)
-                            coords = [(x - min_val) / (max_val - min_val) if max_val > min_val else 0 for x in coords]
-                        
-                        # Create genomic coordinates for x-axis
-                        resolution = row['res']
-                        # Calculate flank for this specific row
-                        num_contacts = len(coords)
-                        row_flank = (num_contacts * resolution) // 2
-                        # Ensure genomic_coords has the same length as coords
-                        genomic_coords = np.linspace(start - row_flank, end + row_flank, len(coords))
-                        
-                        # Create sample label from mcool filename
-                        mcool_filename = os.path.basename(row['mcool'])
-                        
-                        # Get color index for this mcool file
-                        color_index = all_mcool_files.index(row['mcool'])
-                        color = colors[color_index % len(colors)]
-                        
-                        # Check if user provided custom sample names
-                        if sample_names and mcool_filename in sample_names:
-                            sample_label = sample_names[mcool_filename]
-                        else:
-                            # Use default naming: extract prefix from mcool filename
-                            sample_name = mcool_filename.replace('.mcool', '')
-                            # Extract cell type and genome info if available
-                            if 'genome1' in sample_name.lower():
-                                # Extract cell type (e.g., "Astro" from "Astro_merged_chr17.genome1")
-                                cell_type = sample_name.split('_')[0]
-                                sample_label = f"{cell_type} Genome1"
-                            elif 'genome2' in sample_name.lower():
-                                # Extract cell type (e.g., "Astro" from "Astro_merged_chr17.genome2")
-                                cell_type = sample_name.split('_')[0]
-                                sample_label = f"{cell_type} Genome2"
-                            else:
-                                sample_label = sample_name
-                        
-                        plt.plot(genomic_coords, coords, 
-                                label=sample_label,
-                                color=color,
-                                alpha=0.7,
-                                linewidth=2)
-                    except Exception as e:
-                        print(f"Warning: Error plotting data for {row['mcool']} at {coord}: {str(e)}")
-                        continue
-
-            # Customize plot
-            plt.xlabel("Genomic Position (bp)", fontsize=12)
-            plt.ylabel("Hi-C Contact Frequency", fontsize=12)
-            
-            # Format x-axis with scientific notation for large numbers
-            ax = plt.gca()
-            ax.ticklabel_format(style='scientific', axis='x', scilimits=(0,0))
-            
-            # Add coordinate range annotation
-            # Calculate flank from the data (assuming it's the same for all samples)
-            if len(dfs) > 0:
-                sample_data = dfs[0]
-                coord_data = sample_data[(sample_data['chrom'] == chrom) & (sample_data['start'] == start) & (sample_data['end'] == end)]
-                if not coord_data.empty:
-                    # Calculate flank from the number of contact points
-                    num_contacts = len(coord_data.columns) - 6  # 6 metadata columns
-                    # Assuming resolution is consistent, estimate flank
-                    resolution = coord_data['res'].iloc[0]
-                    estimated_flank = (num_contacts * resolution) // 2
-                    coord_range = f"{chrom}:{start-estimated_flank:,}-{end+estimated_flank:,}"
-                else:
-                    coord_range = f"{chrom}:{start:,}-{end:,}"
-            else:
-                coord_range = f"{chrom}:{start:,}-{end:,}"
-            
-            plt.text(0.02, 0.98, f"Region: {coord_range}", 
-                    transform=plt.gca().transAxes, 
-                    fontsize=10, 
-                    verticalalignment='top',
-                    bbox=dict(boxstyle='round', facecolor='white', alpha=0.8))
-            
-            # Create title with gene name if available, otherwise use coordinate
-            coord_key = (chrom, start, end)
-            
-            # Priority 1: Use gene_name from data if available
-            gene_name_from_data = None
-            if has_gene_name:
-                for df in dfs:
-                    coord_data = df[(df['chrom'] == chrom) & (df['start'] == start) & (df['end'] == end)]
-                    if not coord_data.empty and coord_data['gene_name'].iloc[0] and str(coord_data['gene_name'].iloc[0]).strip():
-                        gene_name_from_data = coord_data['gene_name'].iloc[0]
-                        break
-            
-            if gene_name_from_data:
-                plt.title(f"Virtual 4C Comparison - {gene_name_from_data}", fontsize=14)
-            else:
-                coord_label = f"{chrom}:{start}-{end}"
-                plt.title(f"Virtual 4C Comparison - {coord_label}", fontsize=14)
-            
-            plt.legend()
-            plt.ylim(0, ylim)
             
             # Save or show plot
             if output_file:
-                try:
-                    # Create unique filename for each coordinate
-                    base_name = output_file.replace('.png', '').replace('.pdf', '')
-                    
-                    # Use gene name in filename if available, otherwise use coordinate
-                    if gene_name_from_data:
-                        coord_suffix = f"_{gene_name_from_data}"
-                    else:
-                        coord_suffix = f"_{chrom}_{start}_{end}"
-                    unique_output = f"{base_name}{coord_suffix}.png"
-                    print(f"  Saving plot to: {unique_output}")
-                    plt.savefig(unique_output, dpi=dpi, bbox_inches='tight')
-                    plt.close()
-                    print(f"  Plot saved successfully")
-                except Exception as e:
-                    raise FileProcessingError(f"Error saving plot to {output_file}: {str(e)}")
+                unique_output = _save_coord(save_fig, coord, draw_kwargs, output_file, dpi)
+                print(f"  Plot saved to: {unique_output}")
             else:
+                fig, ax = plt.subplots(figsize=figsize)
+                _draw_coord(ax, coord, **draw_kwargs)
                 plt.show()
-                plt.close()
+                plt.close(fig)
 
     except V4CError:
         raise
@@ -242,13 +343,14 @@ def main():
     import argparse
     
     parser = argparse.ArgumentParser(description="Compare Virtual 4C data from multiple files")
-    parser.add_argument("--inputs", required=True, nargs="+", help="Input TSV files from v4c-extract")
+    parser.add_argument("--inputs", required=True, nargs="+", help="Input TSV, HDF5, Parquet or Feather files from v4c-extract")
     parser.add_argument("--ylim", type=float, default=1.0, help="Maximum y-axis value")
     parser.add_argument("--scale", action="store_true", help="Normalize values between 0 and 1")
     parser.add_argument("--output", help="Output file path for saving the plot")
     parser.add_argument("--dpi", type=int, default=300, help="DPI for the output figure")
     parser.add_argument("--sample-names", help="Custom sample names as JSON dict (e.g., '{\"file1.mcool\": \"Sample1\", \"file2.mcool\": \"Sample2\"}')")
     parser.add_argument("--colors", help="Custom colors as JSON list (e.g., '[\"#ff0000\", \"#00ff00\", \"#0000ff\"]')")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of processes used to render plots when saving")
     
     args = parser.parse_args()
     
@@ -265,7 +367,7 @@ def main():
             import json
             colors = json.loads(args.colors)
         
-        compare_v4c(args.inputs, args.ylim, args.scale, args.output, args.dpi, sample_names=sample_names, colors=colors)
+        compare_v4c(args.inputs, args.ylim, args.scale, args.output, args.dpi, sample_names=sample_names, colors=colors, n_jobs=args.jobs)
     except V4CError as e:
         print(f"Error: {str(e)}")
         exit(1)
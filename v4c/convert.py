@@ -1,8 +1,91 @@
 import os
 import subprocess
 import argparse
+import h5py
+import cooler
+from concurrent.futures import ThreadPoolExecutor
+from .extract import V4CError, InputValidationError, FileProcessingError
 
-def convert_hic_to_mcool(hic_file, output_dir="output", resolutions=None):
+# Rows per chunk of the rechunked pixel columns. extract_v4c reads long
+# contiguous runs of pixels, so a few large chunks beat many small ones.
+PIXEL_CHUNK_ROWS = 1048576
+
+def _copy_h5_group(src, dst, chunk_rows):
+    """Recursively copies src into dst, rewriting pixel columns with chunk_rows-row chunks."""
+    dst.attrs.update(src.attrs)
+    for name in src:
+        link = src.get(name, getlink=True)
+        if isinstance(link, h5py.SoftLink):
+            dst[name] = h5py.SoftLink(link.path)
+            continue
+        obj = src[name]
+        if isinstance(obj, h5py.Group):
+            _copy_h5_group(obj, dst.create_group(name), chunk_rows)
+        elif src.name.endswith("/pixels") and obj.ndim == 1:
+            chunks = (max(1, min(chunk_rows, len(obj), obj.maxshape[0] or chunk_rows)),)
+            out = dst.create_dataset(name, shape=obj.shape, dtype=obj.dtype, maxshape=obj.maxshape,
+                                     chunks=chunks, shuffle=True, compression="gzip", compression_opts=1)
+            for offset in range(0, len(obj), chunk_rows):
+                out[offset:offset + chunk_rows] = obj[offset:offset + chunk_rows]
+            out.attrs.update(obj.attrs)
+        else:
+            src.copy(obj, dst, name=name)
+
+def rechunk_mcool(mcool_file, chunk_rows=PIXEL_CHUNK_ROWS):
+    """
+    Rewrites the pixel tables of an .mcool file with large chunks.
+
+    hic2cool writes small pixel chunks, so every extract_v4c query touches
+    many of them. The file is copied with each resolution's pixels/bin1_id,
+    pixels/bin2_id and pixels/count datasets re-chunked to chunk_rows rows,
+    then moved over the original. Pixel columns are byte-shuffled before
+    gzip level 1 compression: sorted bin ids and small counts leave the
+    high bytes nearly constant, which shuffling turns into long runs.
+
+    Parameters:
+    - mcool_file (str): Path to the .mcool file, rewritten in place.
+    - chunk_rows (int): Rows per chunk of the pixel datasets.
+
+    Returns:
+    - Path to the rechunked .mcool file.
+    """
+    tmp_file = mcool_file + ".tmp"
+    try:
+        with h5py.File(mcool_file, "r") as src, h5py.File(tmp_file, "w") as dst:
+            _copy_h5_group(src, dst, chunk_rows)
+        os.replace(tmp_file, mcool_file)
+    except Exception as e:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise FileProcessingError(f"Error rechunking {mcool_file}: {str(e)}")
+    return mcool_file
+
+def _mcool_output_path(hic_file, output_dir):
+    """Returns the .mcool path convert_hic_to_mcool writes for hic_file."""
+    return os.path.join(output_dir, os.path.basename(hic_file).replace(".hic", ".mcool"))
+
+def _has_resolutions(mcool_file, resolutions):
+    """Returns whether mcool_file is a readable .mcool holding every resolution in resolutions."""
+    try:
+        coolers = set(cooler.fileops.list_coolers(mcool_file))
+    except Exception:
+        return False
+    return all(f"/resolutions/{resolution}" in coolers for resolution in resolutions)
+
+def _is_rechunked(mcool_file, chunk_rows=PIXEL_CHUNK_ROWS):
+    """Returns whether every pixel column of mcool_file already has the chunks rechunk_mcool writes."""
+    try:
+        with h5py.File(mcool_file, "r") as f:
+            for resolution in f["resolutions"].values():
+                for column in resolution["pixels"].values():
+                    expected = max(1, min(chunk_rows, len(column), column.maxshape[0] or chunk_rows))
+                    if column.chunks != (expected,):
+                        return False
+    except Exception:
+        return False
+    return True
+
+def convert_hic_to_mcool(hic_file, output_dir="output", resolutions=None, rechunk=False):
     """
     Converts a .hic file to a .mcool file using hic2cool.
 
@@ -10,44 +93,120 @@ def convert_hic_to_mcool(hic_file, output_dir="output", resolutions=None):
     - hic_file (str): Path to the input .hic file.
     - output_dir (str): Directory to save the .mcool file.
     - resolutions (list, optional): List of resolutions to extract.
+    - rechunk (bool): Rewrite the pixel tables with large chunks after conversion
+      (see rechunk_mcool).
 
     Returns:
     - Path to the converted .mcool file.
+
+    Raises:
+    - InputValidationError: If hic_file does not exist.
+    - FileProcessingError: If hic2cool fails; the message carries its stderr.
     """
+    if not os.path.exists(hic_file):
+        raise InputValidationError(f"Input file not found: {hic_file}")
     if resolutions is None:
         resolutions = [1000, 5000, 10000, 25000, 50000, 100000]  # Default resolutions
+    resolutions = sorted(set(resolutions))
 
     # Ensure output directory exists
     os.makedirs(output_dir, exist_ok=True)
 
     # Define output file
-    mcool_file = os.path.join(output_dir, os.path.basename(hic_file).replace(".hic", ".mcool"))
+    mcool_file = _mcool_output_path(hic_file, output_dir)
+
+    # Skip the conversion if the .mcool is already newer than its source and
+    # holds every requested resolution
+    if (os.path.exists(mcool_file) and os.path.getmtime(mcool_file) > os.path.getmtime(hic_file)
+            and _has_resolutions(mcool_file, resolutions)):
+        if rechunk and not _is_rechunked(mcool_file):
+            # Converted earlier without rechunking; only the rechunk is missing
+            rechunk_mcool(mcool_file)
+            print(f"Rechunked up-to-date {mcool_file}")
+        else:
+            print(f"Skipping conversion, {mcool_file} is up to date")
+        return mcool_file
+
+    # Convert into a temporary file that only replaces mcool_file once complete,
+    # so an interrupted run never leaves a partial .mcool that looks up to date
+    tmp_file = mcool_file + ".tmp"
 
     # Build hic2cool command
     cmd = [
         "hic2cool", "convert",
         "--input", hic_file,
-        "--output", mcool_file,
+        "--output", tmp_file,
         "--resolutions"
     ] + list(map(str, resolutions))
 
     try:
-        subprocess.run(cmd, check=True)
+        # Discard the progress output and keep stderr for the error message
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        if rechunk:
+            rechunk_mcool(tmp_file)
+        os.replace(tmp_file, mcool_file)
         print(f"Conversion complete: {mcool_file}")
     except subprocess.CalledProcessError as e:
-        print(f"Error during conversion: {e}")
+        raise FileProcessingError(f"Error converting {hic_file}: {e.stderr.strip() or e}")
+    except OSError as e:
+        raise FileProcessingError(f"Could not run hic2cool: {str(e)}")
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
 
     return mcool_file
 
+def convert_hic_to_mcool_batch(hic_files, output_dir="output", resolutions=None, max_workers=None, rechunk=False):
+    """
+    Converts several .hic files to .mcool files concurrently.
+
+    Each conversion is a separate hic2cool process, so threads are enough to
+    overlap them. Conversions are disk heavy; lower max_workers if the output
+    disk rather than the CPU is the bottleneck.
+
+    Parameters:
+    - hic_files (list): Paths to the input .hic files.
+    - output_dir (str): Directory to save the .mcool files.
+    - resolutions (list, optional): List of resolutions to extract.
+    - max_workers (int, optional): Number of concurrent conversions (default: half the CPUs).
+    - rechunk (bool): Rewrite the pixel tables with large chunks after conversion.
+
+    Returns:
+    - List of paths to the converted .mcool files, in input order.
+
+    Raises:
+    - InputValidationError: If two input files would be converted to the same
+      .mcool path, e.g. same-named files from different directories.
+    """
+    # Concurrent conversions must never write the same output file
+    seen = {}
+    for hic_file in hic_files:
+        mcool_file = _mcool_output_path(hic_file, output_dir)
+        if mcool_file in seen:
+            raise InputValidationError(f"{seen[mcool_file]} and {hic_file} would both be converted to {mcool_file}")
+        seen[mcool_file] = hic_file
+
+    if max_workers is None:
+        max_workers = max(1, (os.cpu_count() or 2) // 2)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda hic_file: convert_hic_to_mcool(hic_file, output_dir, resolutions, rechunk), hic_files))
+
 # Command-line execution
 def main():
     parser = argparse.ArgumentParser(description="Convert .hic to .mcool")
-    parser.add_argument("--hic", type=str, required=True, help="Input .hic file")
+    parser.add_argument("--hic", type=str, nargs="+", required=True, help="Input .hic file(s)")
     parser.add_argument("--output", type=str, default="output", help="Output directory")
     parser.add_argument("--resolutions", nargs="+", type=int, help="List of resolutions")
+    parser.add_argument("--jobs", type=int, help="Number of files converted concurrently (default: half the CPUs)")
+    parser.add_argument("--rechunk", action="store_true", help="Rewrite pixel tables with large chunks for faster extraction")
 
     args = parser.parse_args()
-    convert_hic_to_mcool(args.hic, args.output, args.resolutions)
+    try:
+        convert_hic_to_mcool_batch(args.hic, args.output, args.resolutions, args.jobs, args.rechunk)
+    except V4CError as e:
+        print(f"Error: {str(e)}")
+        exit(1)
 
 if __name__ == "__main__":
     main()
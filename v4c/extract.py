@@ -1,12 +1,23 @@
 import cooler
+import h5py
 import numpy as np
-import pandas as pd
 import argparse
 import os
-from typing import List, Optional, Union
-from .utils import get_promoter_coords, validate_mcool_files
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional, Tuple, Union
+from .utils import META_COLUMNS, get_promoter_coords, read_bed, validate_mcool_files, write_v4c_rows
 import sys
 
+# HDF5 raw-data chunk cache used when reading .mcool files. The default 1 MB
+# cache is far smaller than the pixel blocks touched by neighbouring viewpoints.
+HDF5_CHUNK_CACHE_BYTES = 256 * 1024 * 1024
+HDF5_CHUNK_CACHE_SLOTS = 1000003
+
+# Overlapping promoter windows are fetched as one dense slab spanning at most
+# this many bins (2048 x 2048 float64 is 32 MB)
+MAX_SLAB_BINS = 2048
+
 class V4CError(Exception):
     """Base exception class for V4C errors"""
     pass
@@ -71,6 +82,184 @@ def validate_inputs(mcool_files: List[str],
     if normalization_method not in ["minmax", "self"]:
         raise InputValidationError(f"Invalid normalization method: {normalization_method}. Must be 'minmax' or 'self'")
 
+def _cluster_windows(windows: List[tuple], max_bins: int = MAX_SLAB_BINS):
+    """
+    Groups overlapping matrix windows on the same chromosome.
+
+    Args:
+        windows: (chrom, lo, hi, row_index) bin extents, one per promoter
+        max_bins: Largest slab, in bins per side, that windows are merged into
+
+    Yields:
+        (slab_lo, slab_hi, member_indices) for each group of windows
+    """
+    order = sorted(range(len(windows)), key=lambda i: (windows[i][0], windows[i][1]))
+    slab = None
+    for i in order:
+        chrom, lo, hi, _ = windows[i]
+        if slab is not None and chrom == slab[0] and lo < slab[2] and max(hi, slab[2]) - slab[1] <= max_bins:
+            slab[2] = max(hi, slab[2])
+            slab[3].append(i)
+        else:
+            if slab is not None:
+                yield slab[1], slab[2], slab[3]
+            slab = [chrom, lo, hi, [i]]
+    if slab is not None:
+        yield slab[1], slab[2], slab[3]
+
+def _normalize_rows(rows: List[np.ndarray], center_indices: List[int], normalization_method: str) -> List[np.ndarray]:
+    """
+    Scales extracted rows, batching rows of equal length into one array operation.
+
+    Args:
+        rows: Contact frequency rows, one per promoter
+        center_indices: Position of each promoter's own bin within its row
+        normalization_method: "minmax" (scale to [0, 1]) or "self" (divide by
+            the promoter bin's own value)
+
+    Returns:
+        Normalized rows in the same order; rows that cannot be scaled become zeros
+    """
+    by_length = defaultdict(list)
+    for i, row in enumerate(rows):
+        by_length[len(row)].append(i)
+
+    normalized = [None] * len(rows)
+    for members in by_length.values():
+        # np.stack copies, so the batch can be scaled in place
+        batch = np.stack([rows[i] for i in members])
+        if normalization_method == "self":
+            # Original code self-normalization
+            divisor = batch[np.arange(len(members)), [center_indices[i] for i in members]][:, None]
+        else:  # minmax normalization
+            divisor = np.ptp(batch, axis=1, keepdims=True)
+            batch -= batch.min(axis=1, keepdims=True)
+        # Divide every row unconditionally; rows without a positive divisor are zeroed
+        scalable = divisor > 0
+        np.divide(batch, divisor, out=batch, where=scalable)
+        batch[~scalable[:, 0]] = 0
+        for k, i in enumerate(members):
+            normalized[i] = batch[k]
+    return normalized
+
+def _promoter_windows(promoter_coords: List[tuple],
+                      resolution: int,
+                      flank: int,
+                      use_fixed_center: bool) -> Tuple[List[str], List[int], List[int], List[int]]:
+    """
+    Computes each promoter's flanking region and the row of the promoter in it.
+
+    The result depends only on the promoters and the resolution, so extract_v4c
+    computes it once and shares it between all .mcool files.
+
+    Returns:
+        (chroms, region_starts, region_ends, row_indices) as parallel lists
+    """
+    # Promoter windows as parallel arrays, computed for all promoters at once
+    chroms = [chrom for chrom, _, _ in promoter_coords]
+    starts = np.array([start for _, start, _ in promoter_coords], dtype=np.int64)
+    ends = np.array([end for _, _, end in promoter_coords], dtype=np.int64)
+    if use_fixed_center:
+        # Use original code logic: fixed 500kb flanking from TSS
+        row_bin_starts = (starts // resolution) * resolution
+        region_starts = np.maximum(0, row_bin_starts - flank)
+        region_ends = row_bin_starts + flank
+        # Fixed center position
+        row_indices = np.full(len(starts), flank // resolution, dtype=np.int64)
+    else:
+        # Use current logic: flanking from TSS region, row relative to TSS position
+        region_starts = np.maximum(0, starts - flank)
+        region_ends = ends + flank
+        row_indices = (starts // resolution) - (region_starts // resolution)
+    return chroms, region_starts.tolist(), region_ends.tolist(), row_indices.tolist()
+
+def _extract_one(mcool: str,
+                 resolution: int,
+                 promoter_coords: List[tuple],
+                 gene_mapping: dict,
+                 promoter_windows: Tuple[List[str], List[int], List[int], List[int]],
+                 balance: bool,
+                 scale: bool,
+                 normalization_method: str,
+                 chunk_cache_bytes: int = HDF5_CHUNK_CACHE_BYTES) -> Tuple[List[tuple], np.ndarray, np.ndarray]:
+    """
+    Extracts the V4C rows of every promoter from one .mcool file.
+
+    Module-level so extract_v4c can run it in worker processes. The file is
+    opened once with an HDF5 chunk cache of chunk_cache_bytes, so pixel chunks
+    shared by overlapping windows are decompressed only once.
+    promoter_windows is the output of _promoter_windows for promoter_coords.
+
+    Returns:
+        (meta_rows, contacts, lengths): one (mcool, res, chrom, start, end,
+        gene_name) tuple per promoter, a float32 matrix with one NaN-padded row
+        of contact frequencies per promoter, and the unpadded length of each row
+    """
+    meta_rows = []
+    try:
+        h5 = h5py.File(mcool, "r", rdcc_nbytes=chunk_cache_bytes, rdcc_nslots=HDF5_CHUNK_CACHE_SLOTS, rdcc_w0=0.75)
+    except Exception as e:
+        raise FileProcessingError(f"Error opening file {mcool}: {str(e)}")
+    try:
+        c = cooler.Cooler(h5[f"resolutions/{resolution}"])
+        matrix_selector = c.matrix(balance=balance, sparse=False)
+
+        # Bin extent of each promoter's window and the row of the promoter in it
+        chroms, region_starts, region_ends, row_indices = promoter_windows
+        windows = []
+        for chrom, region_start, region_end, row_index in zip(chroms, region_starts, region_ends, row_indices):
+            lo, hi = c.extent((chrom, region_start, region_end))
+            if row_index >= hi - lo:
+                raise IndexError(f"index {row_index} is out of bounds for axis 0 with size {hi - lo}")
+            windows.append((chrom, lo, hi, row_index))
+
+        # Fetch overlapping windows on a chromosome as one matrix slab. Only the
+        # promoters' own rows are needed, so the slab spans just those rows
+        # instead of the full square window.
+        slabs = []
+        for slab_lo, slab_hi, members in _cluster_windows(windows):
+            row_bins = [windows[i][1] + windows[i][3] for i in members]
+            slabs.append((slab_lo, slab_hi, members, row_bins))
+
+        def fetch_slab(slab):
+            slab_lo, slab_hi, _, row_bins = slab
+            return matrix_selector[min(row_bins):max(row_bins) + 1, slab_lo:slab_hi]
+
+        # Read the next slab in a background thread while the current one is
+        # processed; HDF5 reads and decompression release the GIL
+        rows = [None] * len(windows)
+        with ThreadPoolExecutor(max_workers=1) as prefetcher:
+            pending = prefetcher.submit(fetch_slab, slabs[0]) if slabs else None
+            for k, (slab_lo, slab_hi, members, row_bins) in enumerate(slabs):
+                matrix = pending.result()
+                if k + 1 < len(slabs):
+                    pending = prefetcher.submit(fetch_slab, slabs[k + 1])
+                # Keep just the promoter rows, as float32 which is plenty for contact
+                # frequencies, and clean NaNs in those rows only
+                promoter_rows = matrix[np.asarray(row_bins) - min(row_bins)].astype(np.float32, copy=False)
+                np.nan_to_num(promoter_rows, copy=False)
+                for j, i in enumerate(members):
+                    _, lo, hi, _ = windows[i]
+                    rows[i] = promoter_rows[j, lo - slab_lo:hi - slab_lo]
+
+        # Apply normalization
+        if scale:
+            rows = _normalize_rows(rows, row_indices, normalization_method)
+
+        # Fill a preallocated block rather than collecting per-row objects
+        lengths = np.array([len(row_values) for row_values in rows], dtype=np.int64)
+        contacts = np.full((len(rows), lengths.max(initial=0)), np.nan, dtype=np.float32)
+        for i, ((chrom, start, end), row_values) in enumerate(zip(promoter_coords, rows)):
+            contacts[i, :len(row_values)] = row_values
+            # Add gene name if available
+            gene_name = gene_mapping.get((chrom, start, end), "")
+            meta_rows.append((mcool, resolution, chrom, start, end, gene_name))
+    except Exception as e:
+        raise FileProcessingError(f"Error processing file {mcool} at resolution {resolution}: {str(e)}")
+    finally:
+        h5.close()
+    return meta_rows, contacts, lengths
+
 def extract_v4c(mcool_files: List[str], 
                 resolution: int, 
                 coords: Optional[str] = None, 
@@ -82,7 +271,9 @@ def extract_v4c(mcool_files: List[str],
                 scale: bool = True, 
                 normalization_method: str = "minmax",
                 use_fixed_center: bool = False,
-                output: str = "extracted_data.tsv") -> None:
+                output: str = "extracted_data.tsv",
+                n_jobs: int = 1,
+                chunk_cache_mb: int = HDF5_CHUNK_CACHE_BYTES >> 20) -> None:
     """
     Extracts Virtual 4C contact frequencies from .mcool files at a specific resolution.
 
@@ -98,7 +289,9 @@ def extract_v4c(mcool_files: List[str],
         scale: Whether to normalize values between 0 and 1
         normalization_method: Normalization method - "minmax" or "self" (default: "minmax")
         use_fixed_center: Whether to use fixed center position calculation like original code (default: False)
-        output: Output file name
+        output: Output file name (.tsv, .h5/.hdf5 for HDF5, .parquet/.pq for Parquet or .feather for Feather)
+        n_jobs: Number of worker processes used to read the .mcool files in parallel
+        chunk_cache_mb: Size in MB of the HDF5 chunk cache of each open .mcool file
 
     Returns:
         None: Saves extracted contact frequencies to a TSV file
@@ -111,6 +304,10 @@ def extract_v4c(mcool_files: List[str],
     try:
         # Validate inputs
         validate_inputs(mcool_files, resolution, coords, genes, genome, bed_file, normalization_method)
+        if n_jobs < 1:
+            raise InputValidationError(f"n_jobs must be at least 1: {n_jobs}")
+        if chunk_cache_mb < 0:
+            raise InputValidationError(f"chunk_cache_mb must not be negative: {chunk_cache_mb}")
         
         # Validate mcool files exist
         valid_mcool_files = validate_mcool_files(mcool_files)
@@ -137,16 +334,15 @@ def extract_v4c(mcool_files: List[str],
         elif bed_file:
             try:
                 # Read BED file and determine number of columns
-                bed_df = pd.read_csv(bed_file, sep="\t", header=None)
+                bed_df = read_bed(bed_file)
                 
                 if len(bed_df.columns) >= 4:
                     # BED file has 4+ columns (chrom, start, end, gene_name, ...)
                     bed_df.columns = ["chrom", "start", "end", "gene_name"] + [f"col_{i}" for i in range(4, len(bed_df.columns))]
                     promoter_coords = bed_df[["chrom", "start", "end"]].values.tolist()
                     # Map coordinates to gene names
-                    for i, row in bed_df.iterrows():
-                        coord_tuple = (row["chrom"], row["start"], row["end"])
-                        gene_mapping[coord_tuple] = row["gene_name"]
+                    bed_coords = zip(bed_df["chrom"].to_numpy(), bed_df["start"].to_numpy(), bed_df["end"].to_numpy())
+                    gene_mapping = dict(zip(bed_coords, bed_df["gene_name"].to_numpy()))
                 else:
                     # BED file has only 3 columns (chrom, start, end)
                     bed_df.columns = ["chrom", "start", "end"]
@@ -158,82 +354,41 @@ def extract_v4c(mcool_files: List[str],
         else:
             raise InputValidationError("Either --coords, --genes with --genome, or --bed must be specified.")
 
-        results = []
-
-        for mcool in valid_mcool_files:
-            try:
-                c = cooler.Cooler(f"{mcool}::/resolutions/{resolution}")
-                for chrom, start, end in promoter_coords:
-                    # Calculate region boundaries
-                    if use_fixed_center:
-                        # Use original code logic: fixed 500kb flanking from TSS
-                        row_bin_start = (start // resolution) * resolution
-                        region_start = max(0, row_bin_start - flank)
-                        region_end = row_bin_start + flank
-                    else:
-                        # Use current logic: flanking from TSS region
-                        region_start = max(0, start - flank)
-                        region_end = end + flank
-                    
-                    matrix = c.matrix(balance=balance, sparse=False).fetch((chrom, region_start, region_end))
-                    np.nan_to_num(matrix, copy=False)
-
-                    # Calculate row index
-                    if use_fixed_center:
-                        # Use original code logic: fixed center position
-                        row_index = (flank // resolution)
-                    else:
-                        # Use current logic: relative to TSS position
-                        row_index = (start // resolution) - (region_start // resolution)
-                    
-                    row_values = matrix[row_index, :].tolist()
-
-                    # Apply normalization
-                    if scale:
-                        if normalization_method == "self":
-                            # Original code self-normalization
-                            if row_values[row_index] > 0:
-                                row_values = [x / row_values[row_index] for x in row_values]
-                            else:
-                                row_values = [0] * len(row_values)
-                        else:  # minmax normalization
-                            min_val, max_val = np.min(row_values), np.max(row_values)
-                            row_values = [(x - min_val) / (max_val - min_val) if max_val > min_val else 0 for x in row_values]
-
-                    genomic_coords = np.arange(region_start, region_end, resolution)
-                    # Add gene name if available
-                    gene_name = gene_mapping.get((chrom, start, end), "")
-                    results.append([mcool, resolution, chrom, start, end, gene_name] + row_values)
-            except Exception as e:
-                raise FileProcessingError(f"Error processing file {mcool} at resolution {resolution}: {str(e)}")
+        promoter_windows = _promoter_windows(promoter_coords, resolution, flank, use_fixed_center)
+        extract_args = (resolution, promoter_coords, gene_mapping, promoter_windows, balance, scale,
+                        normalization_method, chunk_cache_mb << 20)
+        if n_jobs > 1 and len(valid_mcool_files) > 1:
+            # Files are independent; read them in parallel worker processes
+            with ProcessPoolExecutor(max_workers=min(n_jobs, len(valid_mcool_files))) as executor:
+                futures = [executor.submit(_extract_one, mcool, *extract_args) for mcool in valid_mcool_files]
+                results = [future.result() for future in futures]
+        else:
+            results = [_extract_one(mcool, *extract_args) for mcool in valid_mcool_files]
 
         try:
-            df = pd.DataFrame(results)
-            # Add column names
-            if len(results) > 0:
-                num_contact_cols = len(results[0]) - 6  # 6 metadata columns (added gene_name)
-                # Generate genomic coordinate column names
-                # Get the first row to determine the genomic region
-                first_row = results[0]
-                chrom, start, end, resolution = first_row[2], first_row[3], first_row[4], first_row[1]
-                
-                # Calculate the genomic coordinates for each contact column
-                contact_cols = []
-                for i in range(num_contact_cols):
-                    # Calculate the genomic position for this contact bin
+            # Metadata tuples plus one contact matrix, preallocated and filled
+            # block by block; rows shorter than the longest row are NaN-padded
+            meta_rows = [meta for file_meta, _, _ in results for meta in file_meta]
+            num_contact_cols = max((block.shape[1] for _, block, _ in results), default=0)
+            contacts = np.full((len(meta_rows), num_contact_cols), np.nan, dtype=np.float32)
+            row = 0
+            for _, block, _ in results:
+                contacts[row:row + len(block), :block.shape[1]] = block
+                row += len(block)
+
+            # Header: metadata columns, then the genomic position of each
+            # contact bin when all rows share the first row's length
+            columns = []
+            if len(meta_rows) > 0:
+                _, resolution, _, start, _, _ = meta_rows[0]
+                first_length = next(lengths[0] for _, _, lengths in results if len(lengths))
+                if first_length == num_contact_cols:
                     # The contact data spans from (start - flank) to (end + flank)
-                    total_region_start = start - flank
-                    bin_position = total_region_start + (i * resolution)
-                    contact_cols.append(str(bin_position))
-                
-                column_names = ["mcool", "res", "chrom", "start", "end", "gene_name"] + contact_cols
-                # Ensure column names match DataFrame columns
-                if len(column_names) == len(df.columns):
-                    df.columns = column_names
+                    contact_cols = [str(position) for position in range(start - flank, start - flank + num_contact_cols * resolution, resolution)]
                 else:
-                    # Fallback: use proper column names
-                    df.columns = ["mcool", "res", "chrom", "start", "end", "gene_name"] + [f"contact_{i}" for i in range(len(df.columns) - 6)]
-            df.to_csv(output, sep="\t", index=False)
+                    contact_cols = [f"contact_{i}" for i in range(num_contact_cols)]
+                columns = META_COLUMNS + contact_cols
+            write_v4c_rows(columns, meta_rows, contacts, output, float_format="%.6g")
         except Exception as e:
             raise FileProcessingError(f"Error saving results to {output}: {str(e)}")
 
@@ -256,7 +411,9 @@ def main():
     parser.add_argument("--no-scale", action="store_true", help="Disable normalization between 0 and 1")
     parser.add_argument("--normalization", choices=["minmax", "self"], default="minmax", help="Normalization method: 'minmax' or 'self' (default: minmax)")
     parser.add_argument("--use-fixed-center", action="store_true", help="Use fixed center position calculation like original code")
-    parser.add_argument("--output", default="extracted_data.tsv", help="Output file name")
+    parser.add_argument("--output", default="extracted_data.tsv", help="Output file name (.tsv, .h5/.hdf5 for HDF5, .parquet/.pq for Parquet or .feather for Feather)")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of processes used to read .mcool files in parallel (default: 1)")
+    parser.add_argument("--chunk-cache-mb", type=int, default=HDF5_CHUNK_CACHE_BYTES >> 20, help="HDF5 chunk cache size per .mcool file in MB (default: 256)")
 
     args = parser.parse_args()
 
@@ -273,7 +430,9 @@ def main():
             scale=not args.no_scale,
             normalization_method=args.normalization,
             use_fixed_center=args.use_fixed_center,
-            output=args.output
+            output=args.output,
+            n_jobs=args.jobs,
+            chunk_cache_mb=args.chunk_cache_mb
         )
     except V4CError as e:
         print(f"Error: {str(e)}", file=sys.stderr)
@@ -1,9 +1,19 @@
+import matplotlib
 import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 import pandas as pd
 import numpy as np
 import os
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Optional, Union
 from .extract import V4CError, InputValidationError, FileProcessingError
+from .utils import TABLE_EXTENSIONS, contact_values, read_v4c_table, sample_label
+
+# Drop line vertices closer than a pixel to the simplified path when drawing,
+# and let Agg render very long lines in chunks. Applied to the figures
+# plot_v4c creates, not to Axes passed in by the caller.
+PLOT_RC_PARAMS = {"path.simplify": True, "path.simplify_threshold": 1.0, "agg.path.chunksize": 10000}
 
 def validate_plot_inputs(input_file: str, ylim: float, flank: int) -> None:
     """
@@ -20,8 +30,8 @@ def validate_plot_inputs(input_file: str, ylim: float, flank: int) -> None:
     if not os.path.exists(input_file):
         raise InputValidationError(f"Input file not found: {input_file}")
     
-    if not input_file.endswith('.tsv'):
-        raise InputValidationError(f"Input file must be a TSV file: {input_file}")
+    if not input_file.endswith(TABLE_EXTENSIONS):
+        raise InputValidationError(f"Input file must be a TSV, HDF5, Parquet or Feather file: {input_file}")
     
     if ylim <= 0:
         raise InputValidationError(f"ylim must be positive: {ylim}")
@@ -29,6 +39,149 @@ def validate_plot_inputs(input_file: str, ylim: float, flank: int) -> None:
     if flank <= 0:
         raise InputValidationError(f"flank must be positive: {flank}")
 
+def _group_rows(df: pd.DataFrame, keys: List[str]) -> list:
+    """
+    Groups table rows by key columns, like df.groupby(keys) with sorted keys.
+
+    Each key column is factorized once and the rows are ordered with a stable
+    np.lexsort, so groups are found by a boundary scan rather than a hash-based
+    GroupBy. Rows with a missing key are dropped, as groupby does.
+
+    Returns:
+        List of (key tuple, row positions) in sorted key order
+    """
+    factorized = [pd.factorize(df[key], sort=True) for key in keys]
+    codes = np.column_stack([key_codes for key_codes, _ in factorized])
+    order = np.lexsort(codes.T[::-1])
+    order = order[(codes[order] >= 0).all(axis=1)]
+    if len(order) == 0:
+        return []
+    sorted_codes = codes[order]
+    bounds = np.concatenate(([0], np.flatnonzero((np.diff(sorted_codes, axis=0) != 0).any(axis=1)) + 1, [len(order)]))
+    return [(tuple(uniques[code] for (_, uniques), code in zip(factorized, sorted_codes[lo])), order[lo:hi])
+            for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+def _draw_group(ax,
+                key: tuple,
+                contact_block: np.ndarray,
+                gene_name,
+                flank: int,
+                ylim: float,
+                sample_names: Optional[dict],
+                colors: Optional[List[str]]) -> None:
+    """
+    Draws the plot of one (sample, region) group into ax.
+
+    Args:
+        key: (mcool, chrom, start, end) of the group
+        contact_block: Contact frequencies of the group's rows
+        gene_name: Gene name of the group, or None to title it by coordinate
+    """
+    mcool_file, chrom, start, end = key
+
+    # Create genomic coordinates for x-axis, shared by every row of the
+    # group since they all have the same number of columns
+    genomic_coords = np.linspace(start - flank, end + flank, contact_block.shape[1])
+
+    # Every row of a group comes from the same mcool file, so the label and
+    # color are resolved once and all rows are drawn in one call. Errors
+    # propagate to plot_v4c, which reports them as V4CError.
+
+    label = sample_label(mcool_file, sample_names)
+
+    # Use provided color or default (always use first color since each group has one sample)
+    color = colors[0] if colors else None
+    
+    # The common single-row group is plotted as a 1D line; the rows of
+    # larger groups become the columns of one 2D call
+    ax.plot(genomic_coords, contact_block[0] if len(contact_block) == 1 else contact_block.T,
+            label=label,
+            color=color,
+            alpha=0.7,
+            linewidth=2,
+            rasterized=True)
+
+    # Customize plot
+    ax.set_xlabel("Genomic Position (bp)", fontsize=12)
+    ax.set_ylabel("Hi-C Contact Frequency", fontsize=12)
+    
+    # Format x-axis with scientific notation for large numbers
+    ax.ticklabel_format(style='scientific', axis='x', scilimits=(0,0))
+    
+    # Add coordinate range annotation
+    coord_range = f"{chrom}:{start-flank:,}-{end+flank:,}"
+    ax.text(0.02, 0.98, f"Region: {coord_range}", 
+            transform=ax.transAxes, 
+            fontsize=10, 
+            verticalalignment='top',
+            bbox=dict(boxstyle='round', facecolor='white', alpha=0.8))
+    
+    # Use gene_name from data if available, otherwise use coordinate
+    if gene_name is not None:
+        title = f"Virtual 4C - {gene_name}"
+    else:
+        coord_label = f"{chrom}:{start}-{end}"
+        title = f"Virtual 4C - {coord_label}"
+    ax.set_title(title, fontsize=14)
+    # A fixed location skips the overlap search of loc='best'
+    ax.legend(loc='upper right')
+    ax.set_ylim(0, ylim)
+
+def _group_output_path(output_file: str, key: tuple, gene_name) -> str:
+    """Returns the per-group PNG path derived from output_file."""
+    mcool_file, chrom, start, end = key
+    # Create unique filename for each coordinate
+    base_name = output_file.replace('.png', '').replace('.pdf', '')
+    
+    # Use gene name and sample info in filename
+    sample_name = os.path.basename(mcool_file).replace('.mcool', '')
+    if gene_name is not None:
+        coord_suffix = f"_{gene_name}_{sample_name}"
+    else:
+        coord_suffix = f"_{chrom}_{start}_{end}_{sample_name}"
+    return f"{base_name}{coord_suffix}.png"
+
+def _new_save_figure(figsize: tuple) -> Figure:
+    """
+    Creates the figure plot_v4c draws saved plots into.
+
+    The figure lives on a plain Agg canvas, bypassing pyplot and whichever
+    interactive backend is active, so saving never sets up a GUI. It uses
+    fixed margins instead of bbox_inches='tight', which costs an extra draw
+    pass per figure.
+    """
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    fig.add_subplot()
+    fig.subplots_adjust(left=0.10, right=0.97, top=0.92, bottom=0.12)
+    return fig
+
+def _save_group(fig, draw_args: tuple, output_file: str, dpi: int) -> str:
+    """Redraws fig with the plot of one group and saves it as PNG; returns the saved path."""
+    ax = fig.axes[0]
+    ax.clear()
+    _draw_group(ax, *draw_args)
+    key, gene_name = draw_args[0], draw_args[2]
+    unique_output = _group_output_path(output_file, key, gene_name)
+    try:
+        fig.savefig(unique_output, dpi=dpi)
+    except Exception as e:
+        raise FileProcessingError(f"Error saving plot to {output_file}: {str(e)}")
+    return unique_output
+
+# Save options of a pool worker, set once by _init_render_worker
+_render_state = {}
+
+def _init_render_worker(figsize: tuple, output_file: str, dpi: int) -> None:
+    """Creates the figure a worker process redraws for every group it saves."""
+    matplotlib.rcParams.update(PLOT_RC_PARAMS)
+    _render_state.update(fig=_new_save_figure(figsize), output_file=output_file, dpi=dpi)
+
+def _render_group(draw_args: tuple) -> str:
+    """Draws and saves the plot of one group in a worker process; returns its path."""
+    state = _render_state
+    return _save_group(state['fig'], draw_args, state['output_file'], state['dpi'])
+
 def plot_v4c(input_file: str, 
              ylim: float = 0.4, 
              flank: int = 50000,
@@ -36,7 +189,9 @@ def plot_v4c(input_file: str,
              dpi: int = 300,
              figsize: tuple = (10, 6),
              sample_names: Optional[dict] = None,
-             colors: Optional[List[str]] = None) -> None:
+             colors: Optional[List[str]] = None,
+             ax=None,
+             n_jobs: int = 1) -> None:
     """
     Plots Virtual 4C contact frequencies.
 
@@ -49,6 +204,12 @@ def plot_v4c(input_file: str,
         figsize: Figure size (width, height) in inches
         sample_names: Optional dict mapping mcool filenames to custom sample names
         colors: Optional list of colors for different samples
+        ax: Optional matplotlib Axes, or sequence of Axes, to draw into. Each
+            (sample, region) group is drawn into the next Axes in order and the
+            figure is left to the caller to save or show. PLOT_RC_PARAMS
+            are not applied; the caller's rcParams decide how it renders.
+        n_jobs: Number of worker processes used to render the per-group plots
+            when output_file is given
 
     Returns:
         None: Displays or saves the plot
@@ -61,11 +222,13 @@ def plot_v4c(input_file: str,
     try:
         # Validate inputs
         validate_plot_inputs(input_file, ylim, flank)
+        if n_jobs < 1:
+            raise InputValidationError(f"n_jobs must be at least 1: {n_jobs}")
         
         
         # Read and validate data
         try:
-            df = pd.read_csv(input_file, sep="\t")
+            df = read_v4c_table(input_file)
             required_columns = ["mcool", "res", "chrom", "start", "end"]
             if not all(col in df.columns for col in required_columns):
                 raise InputValidationError(f"Input file missing required columns: {required_columns}")
@@ -79,106 +242,52 @@ def plot_v4c(input_file: str,
         if colors is None:
             colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf']
         
+        # Contact frequencies as one numeric block
+        contacts = contact_values(df)
+        gene_names = df['gene_name'].to_numpy() if has_gene_name else None
+
         # Create plots for each sample and gene combination
         # Group by mcool file and coordinate (gene)
-        for (mcool_file, chrom, start, end), coord_group in df.groupby(['mcool', 'chrom', 'start', 'end']):
-            plt.figure(figsize=figsize)
-            
-            # Plot each sample for this coordinate
-            for i, (_, row) in enumerate(coord_group.iterrows()):
-                try:
-                    # Skip metadata columns (mcool, res, chrom, start, end, gene_name)
-                    coords = list(map(float, row[6:].values))
-                    # Create sample label from mcool filename
-                    mcool_filename = os.path.basename(row['mcool'])
-                    
-                    # Check if user provided custom sample names
-                    if sample_names and mcool_filename in sample_names:
-                        sample_label = sample_names[mcool_filename]
-                    else:
-                        # Use default naming: extract prefix from mcool filename
-                        sample_name = mcool_filename.replace('.mcool', '')
-                        # Extract cell type and genome info if available
-                        if 'genome1' in sample_name.lower():
-                            # Extract cell type (e.g., "Astro" from "Astro_merged_chr17.genome1")
-                            cell_type = sample_name.split('_')[0]
-                            sample_label = f"{cell_type} Genome1"
-                        elif 'genome2' in sample_name.lower():
-                            # Extract cell type (e.g., "Astro" from "Astro_merged_chr17.genome2")
-                            cell_type = sample_name.split('_')[0]
-                            sample_label = f"{cell_type} Genome2"
-                        else:
-                            sample_label = sample_name
-                    
-                    # Create genomic coordinates for x-axis
-                    resolution = row['res']
-                    # Ensure genomic_coords has the same length as coords
-                    genomic_coords = np.linspace(start - flank, end + flank, len(coords))
-                    
-                    # Use provided color or default (always use first color since each group has one sample)
-                    color = colors[0] if colors else None
-                    
-                    plt.plot(genomic_coords, coords, 
-                            label=sample_label,
-                            color=color,
-                            alpha=0.7,
-                            linewidth=2)
-                except Exception as e:
-                    raise FileProcessingError(f"Error plotting data: {str(e)}")
-
-            # Customize plot
-            plt.xlabel("Genomic Position (bp)", fontsize=12)
-            plt.ylabel("Hi-C Contact Frequency", fontsize=12)
-            
-            # Format x-axis with scientific notation for large numbers
-            ax = plt.gca()
-            ax.ticklabel_format(style='scientific', axis='x', scilimits=(0,0))
-            
-            # Add coordinate range annotation
-            coord_range = f"{chrom}:{start-flank:,}-{end+flank:,}"
-            plt.text(0.02, 0.98, f"Region: {coord_range}", 
-                    transform=plt.gca().transAxes, 
-                    fontsize=10, 
-                    verticalalignment='top',
-                    bbox=dict(boxstyle='round', facecolor='white', alpha=0.8))
-            
-            # Create title with gene name if available, otherwise use coordinate
-            coord_key = (chrom, start, end)
-            
-            # Use gene_name from data if available, otherwise use coordinate
-            if has_gene_name and coord_group['gene_name'].iloc[0] and str(coord_group['gene_name'].iloc[0]).strip():
-                gene_name = coord_group['gene_name'].iloc[0]
-                title = f"Virtual 4C - {gene_name}"
-            else:
-                coord_label = f"{chrom}:{start}-{end}"
-                title = f"Virtual 4C - {coord_label}"
-            plt.title(title, fontsize=14)
-            plt.legend()
-            plt.ylim(0, ylim)
-            
-            # Save or show plot
-            if output_file:
-                try:
-                    # Create unique filename for each coordinate
-                    base_name = output_file.replace('.png', '').replace('.pdf', '')
-                    
-                    # Use gene name and sample info in filename
-                    if has_gene_name and coord_group['gene_name'].iloc[0] and str(coord_group['gene_name'].iloc[0]).strip() and str(coord_group['gene_name'].iloc[0]) != 'nan':
-                        gene_name = coord_group['gene_name'].iloc[0]
-                        # Extract sample name from mcool file path
-                        sample_name = os.path.basename(mcool_file).replace('.mcool', '')
-                        coord_suffix = f"_{gene_name}_{sample_name}"
-                    else:
-                        sample_name = os.path.basename(mcool_file).replace('.mcool', '')
-                        coord_suffix = f"_{chrom}_{start}_{end}_{sample_name}"
-                    unique_output = f"{base_name}{coord_suffix}.png"
-                    plt.savefig(unique_output, dpi=dpi, bbox_inches='tight')
-                    plt.close()
-                except Exception as e:
-                    raise FileProcessingError(f"Error saving plot to {output_file}: {str(e)}")
-            else:
-                plt.show()
-                plt.close()
+        groups = _group_rows(df, ['mcool', 'chrom', 'start', 'end'])
+        if ax is not None:
+            target_axes = np.ravel(ax)
+            if len(target_axes) < len(groups):
+                raise InputValidationError(f"Need {len(groups)} axes to plot {input_file}, got {len(target_axes)}")
+
+        # Per-group arguments of _draw_group; only the group's own rows are
+        # passed, so worker processes never receive the whole table
+        group_args = []
+        for key, group_rows in groups:
+            # Gene name of the group's first row, checked once; missing or
+            # blank names fall back to the coordinate
+            gene_name = gene_names[group_rows[0]] if has_gene_name else None
+            if gene_name is not None and (pd.isna(gene_name) or not str(gene_name).strip()):
+                gene_name = None
+            group_args.append((key, contacts[group_rows], gene_name,
+                               flank, ylim, sample_names, colors))
+
+        if ax is not None:
+            # Caller owns the figure
+            for target_ax, draw_args in zip(target_axes, group_args):
+                _draw_group(target_ax, *draw_args)
+        elif output_file and n_jobs > 1 and len(group_args) > 1:
+            # Figures are independent, so render them in worker processes
+            with ProcessPoolExecutor(max_workers=min(n_jobs, len(group_args)), initializer=_init_render_worker,
+                                     initargs=(figsize, output_file, dpi)) as executor:
+                list(executor.map(_render_group, group_args))
+        elif output_file:
+            # One figure is redrawn for every saved group
+            with plt.rc_context(PLOT_RC_PARAMS):
+                save_fig = _new_save_figure(figsize)
+                for draw_args in group_args:
+                    _save_group(save_fig, draw_args, output_file, dpi)
+        else:
+            with plt.rc_context(PLOT_RC_PARAMS):
+                for draw_args in group_args:
+                    fig, group_ax = plt.subplots(figsize=figsize)
+                    _draw_group(group_ax, *draw_args)
+                    plt.show()
+                    plt.close(fig)
 
     except V4CError:
         raise
@@ -190,13 +299,14 @@ def main():
     import argparse
     
     parser = argparse.ArgumentParser(description="Plot Virtual 4C contact frequencies")
-    parser.add_argument("--input", required=True, help="Input TSV file from v4c-extract")
+    parser.add_argument("--input", required=True, help="Input TSV, HDF5, Parquet or Feather file from v4c-extract")
     parser.add_argument("--ylim", type=float, default=0.4, help="Maximum y-axis value")
     parser.add_argument("--flank", type=int, default=50000, help="Flanking region in bp")
     parser.add_argument("--output", help="Output file path for saving the plot")
     parser.add_argument("--dpi", type=int, default=300, help="DPI for the output figure")
     parser.add_argument("--sample-names", help="Custom sample names as JSON dict (e.g., '{\"file1.mcool\": \"Sample1\", \"file2.mcool\": \"Sample2\"}')")
     parser.add_argument("--colors", help="Custom colors as JSON list (e.g., '[\"#ff0000\", \"#00ff00\", \"#0000ff\"]')")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of processes used to render plots when --output is given (default: 1)")
     
     args = parser.parse_args()
     
@@ -213,7 +323,7 @@ def main():
             import json
             colors = json.loads(args.colors)
         
-        plot_v4c(args.input, args.ylim, args.flank, args.output, args.dpi, sample_names=sample_names, colors=colors)
+        plot_v4c(args.input, args.ylim, args.flank, args.output, args.dpi, sample_names=sample_names, colors=colors, n_jobs=args.jobs)
     except V4CError as e:
         print(f"Error: {str(e)}")
         exit(1)
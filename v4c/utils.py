@@ -1,9 +1,114 @@
 import pandas as pd
 import numpy as np
 import os
-from typing import List
+import csv
+import hashlib
+from collections import OrderedDict, defaultdict
+from functools import lru_cache
+from typing import List, Optional, Set
 
-def get_promoter_coords(genome, chrom=None, start=None, end=None, gene=None):
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+    from pyarrow import parquet as pa_parquet
+except ImportError:  # pyarrow is optional; fall back to the pandas parser
+    pa = pa_csv = pa_parquet = None
+
+# Extensions understood by read_v4c_table / write_v4c_table
+TSV_EXTENSIONS = (".tsv",)
+HDF5_EXTENSIONS = (".h5", ".hdf5")
+PARQUET_EXTENSIONS = (".parquet", ".pq")
+FEATHER_EXTENSIONS = (".feather",)
+BINARY_EXTENSIONS = HDF5_EXTENSIONS + PARQUET_EXTENSIONS + FEATHER_EXTENSIONS
+TABLE_EXTENSIONS = TSV_EXTENSIONS + BINARY_EXTENSIONS
+
+# Key of the extracted table inside HDF5 outputs
+HDF5_KEY = "v4c"
+
+# Metadata columns preceding the contact columns of an extracted table
+META_COLUMNS = ["mcool", "res", "chrom", "start", "end", "gene_name"]
+
+# Size of the blocks the pyarrow reader parses in parallel, and the total size
+# of the parsed tables kept in memory for repeated reads
+TSV_BLOCK_BYTES = 4 << 20
+TSV_CACHE_BYTES = 512 << 20
+
+# On-disk cache of parsed promoter annotations (Parquet, or pickle without pyarrow)
+PROMOTER_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "v4c")
+
+def _promoter_cache_file(genome: str, promoter_file: str, extension: str) -> str:
+    """Returns the PROMOTER_CACHE_DIR path caching one promoter BED file."""
+    # Keyed by the absolute BED path, so annotations of the same genome from
+    # different directories never share a cache file
+    path_key = hashlib.sha1(promoter_file.encode()).hexdigest()[:16]
+    return os.path.join(PROMOTER_CACHE_DIR, f"promoters_{genome}_{path_key}{extension}")
+
+@lru_cache(maxsize=4)
+def _load_promoters(genome: str, promoter_file: str, mtime_ns: int):
+    """
+    Loads a promoter annotation once per file version.
+
+    The parsed table is also cached on disk in PROMOTER_CACHE_DIR and reused by
+    later sessions for the same BED path and modification time, both recorded
+    in the cache file: as Parquet when pyarrow is installed, which keeps the
+    column types, otherwise as a pickle.
+
+    Returns:
+    - (chrom_arr, start_arr, end_arr, file_rows, chrom_to_slice, gene_to_rows):
+      promoter columns sorted by chromosome and start, the file row of each
+      sorted row, the slice of each chromosome's rows, and the row positions
+      of each gene
+    """
+    use_parquet = pa is not None
+    cache_file = _promoter_cache_file(genome, promoter_file, ".parquet" if use_parquet else ".pkl")
+    promoters = None
+    try:
+        if use_parquet:
+            table = pa_parquet.read_table(cache_file)
+            source = table.schema.metadata[b"v4c_source"].decode()
+            cached_mtime_ns = int(table.schema.metadata[b"v4c_mtime_ns"])
+            cached = table.to_pandas()
+        else:
+            payload = pd.read_pickle(cache_file)
+            source, cached_mtime_ns, cached = payload["source"], payload["mtime_ns"], payload["promoters"]
+        if source == promoter_file and cached_mtime_ns == mtime_ns:
+            promoters = cached
+    except Exception:
+        promoters = None
+    if promoters is None:
+        # Parsed with the pyarrow CSV reader when it is installed
+        promoters = read_bed(promoter_file)
+        promoters.columns = ["chrom", "start", "end", "gene"]
+        try:
+            os.makedirs(PROMOTER_CACHE_DIR, exist_ok=True)
+            if use_parquet:
+                table = pa.Table.from_pandas(promoters, preserve_index=False)
+                table = table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                                       b"v4c_source": promoter_file.encode(),
+                                                       b"v4c_mtime_ns": str(mtime_ns).encode()})
+                pa_parquet.write_table(table, cache_file, compression="zstd")
+            else:
+                pd.to_pickle({"source": promoter_file, "mtime_ns": mtime_ns, "promoters": promoters}, cache_file)
+        except OSError:
+            pass  # caching is best effort, e.g. in a read-only home directory
+
+    # Sort by chromosome, then start, and record the slice of rows each
+    # chromosome occupies
+    chrom_codes, chrom_names = pd.factorize(promoters["chrom"])
+    order = np.lexsort((promoters["start"].to_numpy(), chrom_codes))
+    chrom_arr = promoters["chrom"].to_numpy()[order]
+    start_arr = promoters["start"].to_numpy()[order]
+    end_arr = promoters["end"].to_numpy()[order]
+    bounds = np.searchsorted(chrom_codes[order], np.arange(len(chrom_names) + 1))
+    chrom_to_slice = {name: slice(lo, hi) for name, lo, hi in zip(chrom_names, bounds[:-1], bounds[1:])}
+
+    # Sorted positions of each gene's rows, in file order
+    sorted_pos = np.empty_like(order)
+    sorted_pos[order] = np.arange(len(order))
+    gene_to_rows = {gene: sorted_pos[rows] for gene, rows in promoters.groupby("gene").indices.items()}
+    return chrom_arr, start_arr, end_arr, order, chrom_to_slice, gene_to_rows
+
+def get_promoter_coords(genome, chrom=None, start=None, end=None, gene=None, as_list=True):
     """
     Retrieves promoter coordinates for a given genome build.
 
@@ -13,34 +118,96 @@ def get_promoter_coords(genome, chrom=None, start=None, end=None, gene=None):
     - start (int, optional): Start position
     - end (int, optional): End position
     - gene (str, optional): Gene name
+    - as_list (bool, optional): Return Python lists (default); False returns
+      NumPy arrays without boxing every coordinate
 
     Returns:
-    - list of tuples [(chrom, start, end)]
+    - list of tuples [(chrom, start, end)], or a (chroms, starts, ends) tuple
+      of arrays when as_list is False; empty when neither a gene nor a full
+      region (chrom, start and end) is given
     """
     promoter_file = f"genome/{genome}_promoters.bed"
-    promoters = pd.read_csv(promoter_file, sep="\t", header=None, names=["chrom", "start", "end", "gene"])
+    chrom_arr, start_arr, end_arr, file_rows, chrom_to_slice, gene_to_rows = _load_promoters(
+        genome, os.path.abspath(promoter_file), os.stat(promoter_file).st_mtime_ns)
 
     if gene:
-        return promoters[promoters["gene"] == gene][["chrom", "start", "end"]].values.tolist()
+        rows = gene_to_rows.get(gene, np.empty(0, dtype=np.intp))
+    elif start is None or end is None:
+        # A region query needs both ends; without them nothing matches
+        rows = np.empty(0, dtype=np.intp)
+    else:
+        # Promoters of the chromosome are sorted by start, so those starting
+        # at or before end are a prefix found by binary search
+        sl = chrom_to_slice.get(chrom, slice(0, 0))
+        hi = sl.start + np.searchsorted(start_arr[sl], end, side="right")
+        rows = sl.start + np.flatnonzero(end_arr[sl.start:hi] >= start)
+        # Report matches in file order
+        rows = rows[np.argsort(file_rows[rows], kind="stable")]
 
-    return promoters[(promoters["chrom"] == chrom) & (promoters["start"] <= end) & (promoters["end"] >= start)][["chrom", "start", "end"]].values.tolist()
+    if not as_list:
+        return chrom_arr[rows], start_arr[rows], end_arr[rows]
+    return [list(coord) for coord in zip(chrom_arr[rows].tolist(), start_arr[rows].tolist(), end_arr[rows].tolist())]
 
 
-def normalize_data(data):
+def normalize_data(data, out=None):
     """
     Applies Min-Max normalization to scale data between 0 and 1.
 
     Parameters:
     - data (list or np.array): Raw contact frequency data
+    - out (np.array, optional): Array to write the result into instead of
+      allocating a new one; may be data itself to normalize in place
 
     Returns:
-    - np.array: Normalized data
+    - np.array: Normalized data (out when given)
     """
-    min_val, max_val = np.min(data), np.max(data)
+    # Floating input keeps its precision (float32 stays float32); anything
+    # else is promoted to float64 as the arithmetic would
+    arr = np.asarray(data)
+    if not np.issubdtype(arr.dtype, np.floating):
+        arr = arr.astype(np.float64)
+    min_val, max_val = arr.min(), arr.max()
     if max_val > min_val:
-        return (data - min_val) / (max_val - min_val)
-    else:
-        return np.zeros_like(data)
+        # One allocation for the result at most, then scaled in place
+        normalized = np.subtract(arr, min_val, out=out)
+        normalized /= max_val - min_val
+        return normalized
+    if out is None:
+        return np.zeros_like(arr)
+    out[...] = 0
+    return out
+
+@lru_cache(maxsize=None)
+def _default_sample_label(mcool_filename: str) -> str:
+    """Derives a sample label from an .mcool file name; cached per name."""
+    # Use default naming: extract prefix from mcool filename
+    sample_name = mcool_filename.replace('.mcool', '')
+    # Extract cell type and genome info if available
+    lower_name = sample_name.lower()
+    if 'genome1' in lower_name:
+        # Extract cell type (e.g., "Astro" from "Astro_merged_chr17.genome1")
+        return f"{sample_name.split('_')[0]} Genome1"
+    if 'genome2' in lower_name:
+        # Extract cell type (e.g., "Astro" from "Astro_merged_chr17.genome2")
+        return f"{sample_name.split('_')[0]} Genome2"
+    return sample_name
+
+def sample_label(mcool: str, sample_names: Optional[dict] = None) -> str:
+    """
+    Returns the legend label of a sample.
+
+    Args:
+        mcool: Path of the sample's .mcool file
+        sample_names: Optional dict mapping mcool filenames to custom sample names
+
+    Returns:
+        The custom name if one is given, otherwise a name derived from the file name
+    """
+    mcool_filename = os.path.basename(mcool)
+    # Check if user provided custom sample names
+    if sample_names and mcool_filename in sample_names:
+        return sample_names[mcool_filename]
+    return _default_sample_label(mcool_filename)
 
 def validate_mcool_files(mcool_files: List[str]) -> List[str]:
     """
@@ -55,9 +222,11 @@ def validate_mcool_files(mcool_files: List[str]) -> List[str]:
     Raises:
         ValueError: If no valid files are found
     """
+    # One directory listing per parent directory instead of a stat per file
+    missing = find_missing_files(mcool_files)
     valid_files = []
     for file in mcool_files:
-        if not os.path.exists(file):
+        if file in missing:
             print(f"Warning: File not found: {file}")
             continue
         if not file.endswith('.mcool'):
@@ -68,4 +237,206 @@ def validate_mcool_files(mcool_files: List[str]) -> List[str]:
     if not valid_files:
         raise ValueError("No valid .mcool files found")
     
-    return valid_files
\ No newline at end of file
+    return valid_files
+
+def read_bed(path: str) -> pd.DataFrame:
+    """
+    Reads a headerless, tab-separated BED file.
+
+    Uses the multithreaded pyarrow CSV reader when pyarrow is installed.
+
+    Args:
+        path: Path to the BED file
+
+    Returns:
+        DataFrame with columns numbered from 0, as pd.read_csv(header=None) gives
+    """
+    if pa_csv is not None:
+        table = pa_csv.read_csv(
+            path,
+            read_options=pa_csv.ReadOptions(autogenerate_column_names=True),
+            parse_options=pa_csv.ParseOptions(delimiter="\t"),
+        )
+        bed_df = table.to_pandas(self_destruct=True)
+        bed_df.columns = range(len(bed_df.columns))
+        return bed_df
+    return pd.read_csv(path, sep="\t", header=None)
+
+def find_missing_files(paths: List[str]) -> Set[str]:
+    """
+    Returns the paths that do not exist, listing each parent directory once.
+
+    One os.scandir per directory replaces a stat call per file, which is
+    much cheaper for large batches on network filesystems. Directories that
+    cannot be listed fall back to os.path.exists for each of their paths.
+
+    Args:
+        paths: File paths to check
+
+    Returns:
+        Set of the given paths that were not found
+    """
+    by_dir = defaultdict(list)
+    for path in paths:
+        by_dir[os.path.dirname(path) or "."].append(path)
+
+    missing = set()
+    for directory, dir_paths in by_dir.items():
+        try:
+            with os.scandir(directory) as entries:
+                existing = {entry.name for entry in entries}
+        except OSError:
+            # The directory may be missing or just not listable (execute-only);
+            # files in the latter can still be opened, so check them one by one
+            missing.update(path for path in dir_paths if not os.path.exists(path))
+            continue
+        missing.update(path for path in dir_paths if os.path.basename(path) not in existing)
+    return missing
+
+# Parsed TSV tables by absolute path, as (mtime_ns, size, table), least
+# recently used first
+_tsv_cache = OrderedDict()
+
+def _read_tsv_arrow(path: str, mtime_ns: int, size: int):
+    """
+    Parses a TSV table with the multithreaded pyarrow CSV reader.
+
+    Parsed tables are cached per path and file version (mtime and size), so
+    reading the same unchanged file again, e.g. calling compare_v4c repeatedly
+    in a notebook, converts the cached Arrow table instead of re-parsing text.
+    The cache holds at most TSV_CACHE_BYTES of tables, dropping the least
+    recently used first; larger tables are never cached.
+
+    The contact columns, those after the last metadata column, are declared
+    as float64 from the header line, so the reader skips type inference on
+    them; any other column is inferred.
+    """
+    cached = _tsv_cache.get(path)
+    if cached is not None and cached[:2] == (mtime_ns, size):
+        _tsv_cache.move_to_end(path)
+        return cached[2]
+
+    with open(path) as f:
+        header = next(csv.reader(f, delimiter="\t"), [])
+    data_start = max((i + 1 for i, name in enumerate(header) if name in META_COLUMNS), default=0)
+    column_types = {name: pa.float64() for name in header[data_start:]}
+    column_types.update(res=pa.int64(), start=pa.int64(), end=pa.int64())
+    table = pa_csv.read_csv(
+        path,
+        read_options=pa_csv.ReadOptions(block_size=TSV_BLOCK_BYTES),
+        parse_options=pa_csv.ParseOptions(delimiter="\t"),
+        # Blank fields read as missing, as pandas reads them
+        convert_options=pa_csv.ConvertOptions(column_types=column_types, strings_can_be_null=True),
+    )
+    # Columns with no values at all (e.g. gene_name for coordinate queries)
+    # come back as NaN, like pandas reads them
+    for i, field in enumerate(table.schema):
+        if pa.types.is_null(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(pa.float64()))
+
+    _tsv_cache.pop(path, None)
+    if table.nbytes <= TSV_CACHE_BYTES:
+        _tsv_cache[path] = (mtime_ns, size, table)
+        cached_bytes = sum(entry[2].nbytes for entry in _tsv_cache.values())
+        while cached_bytes > TSV_CACHE_BYTES:
+            _, (_, _, evicted) = _tsv_cache.popitem(last=False)
+            cached_bytes -= evicted.nbytes
+    return table
+
+def read_v4c_table(path: str) -> pd.DataFrame:
+    """
+    Reads an extracted V4C table, choosing the format from the file extension.
+
+    Args:
+        path: Path to a .tsv, .h5/.hdf5, .parquet/.pq or .feather file written by extract_v4c
+
+    Returns:
+        DataFrame with metadata columns followed by contact frequency columns
+    """
+    if path.endswith(HDF5_EXTENSIONS):
+        return pd.read_hdf(path, key=HDF5_KEY, mode="r")
+    if path.endswith(PARQUET_EXTENSIONS):
+        # Memory-map the file so repeated reads are served from the page cache
+        return pd.read_parquet(path, engine="pyarrow", memory_map=True)
+    if path.endswith(FEATHER_EXTENSIONS):
+        return pd.read_feather(path)
+    if pa_csv is not None:
+        stat = os.stat(path)
+        try:
+            return _read_tsv_arrow(os.path.abspath(path), stat.st_mtime_ns, stat.st_size).to_pandas()
+        except pa.ArrowInvalid:
+            pass  # e.g. a text column among the contacts; let pandas infer every type
+    return pd.read_csv(path, sep="\t")
+
+def contact_values(df: pd.DataFrame) -> np.ndarray:
+    """
+    Returns the contact columns of an extracted table as one float32 2D array.
+
+    The leading metadata columns present are skipped (tables without
+    gene_name have one fewer); the array is row-major, one row per table row.
+    """
+    data_start = sum(col in df.columns for col in META_COLUMNS)
+    return np.ascontiguousarray(df.iloc[:, data_start:].to_numpy(dtype=np.float32))
+
+def write_v4c_table(df: pd.DataFrame, path: str) -> None:
+    """
+    Writes an extracted V4C table, choosing the format from the file extension.
+
+    HDF5 (.h5/.hdf5), Parquet (.parquet/.pq) and Feather (.feather) outputs
+    store the table as compressed binary columns, which avoids float-to-text
+    conversion and reloads much faster than TSV. HDF5 needs the optional
+    PyTables package, Parquet and Feather need pyarrow.
+
+    Args:
+        df: Table to write
+        path: Output path; anything without a binary format extension is written as TSV
+    """
+    if path.endswith(HDF5_EXTENSIONS):
+        df.to_hdf(path, key=HDF5_KEY, mode="w", format="fixed", complib="blosc:lz4", complevel=3)
+    elif path.endswith(PARQUET_EXTENSIONS):
+        df.to_parquet(path, compression="zstd", index=False)
+    elif path.endswith(FEATHER_EXTENSIONS):
+        df.to_feather(path)
+    else:
+        df.to_csv(path, sep="\t", index=False)
+
+def write_v4c_rows(columns: List[str], meta_rows: List[tuple], contacts: np.ndarray, path: str,
+                   float_format: Optional[str] = None) -> None:
+    """
+    Writes extracted V4C rows given as metadata tuples plus a contact matrix.
+
+    TSV output is streamed straight from the matrix with the csv module rather
+    than built as a DataFrame first, which would box every contact value into
+    a Python object. Missing values are written as empty fields, like
+    DataFrame.to_csv does. Other formats go through write_v4c_table.
+
+    Args:
+        columns: Metadata column names followed by contact column names
+        meta_rows: One tuple of metadata values per row
+        contacts: 2D array with one row of contact frequencies per metadata tuple
+        path: Output path; the format is chosen from the extension
+        float_format: Optional printf-style format for TSV contact values
+            (e.g. "%.6g"); by default values are written at full precision
+    """
+    if path.endswith(BINARY_EXTENSIONS):
+        num_meta = len(columns) - contacts.shape[1]
+        df = pd.concat([pd.DataFrame(meta_rows, columns=columns[:num_meta]),
+                        pd.DataFrame(contacts, columns=columns[num_meta:])], axis=1)
+        write_v4c_table(df, path)
+        return
+
+    if float_format is not None:
+        text = np.char.mod(float_format, contacts)
+        text[np.isnan(contacts)] = ""
+
+    with open(path, "w", newline="", buffering=1 << 20) as f:
+        writer = csv.writer(f, delimiter="\t", lineterminator="\n")
+        writer.writerow(columns)
+        for i, (meta, row) in enumerate(zip(meta_rows, contacts)):
+            if float_format is not None:
+                values = text[i].tolist()
+            else:
+                values = row.tolist()
+                if np.isnan(row).any():
+                    values = ["" if value != value else value for value in values]
+            writer.writerow(["" if value != value else value for value in meta] + values)